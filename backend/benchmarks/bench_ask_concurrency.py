@@ -0,0 +1,66 @@
+"""
+Test obciążenia: wiele równoległych /ask nie może blokować pozostałych endpointów.
+
+Odpala --asks zapytań /projects/{id}/ask naraz i w tym samym czasie mierzy
+opóźnienie /auth/login. Przy synchronicznym backendzie czas logowania rośnie
+razem z liczbą wiszących /ask (wyczerpana pula wątków), przy async zostaje płaski.
+
+    cd backend
+    uvicorn main:app &
+    python -m benchmarks.bench_ask_concurrency --url http://127.0.0.1:8000 --project 1 \\
+        --username test --password test --asks 64
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def ask(http: httpx.AsyncClient, project_id: int):
+    response = await http.post(f"/projects/{project_id}/ask", json={"question": "Ile jest tabel w bazie?"})
+    return response.status_code
+
+
+async def login_loop(http: httpx.AsyncClient, username: str, password: str, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await http.post("/auth/login", json={"username": username, "password": password})
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--project", type=int, required=True)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--asks", type=int, default=64)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.asks + 8)
+    async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits) as http:
+        stop = asyncio.Event()
+        logins = asyncio.create_task(login_loop(http, args.username, args.password, stop))
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(ask(http, args.project) for _ in range(args.asks)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        latencies = await logins
+
+    print(f"/ask: {args.asks} żądań w {elapsed:.2f}s, statusy: {sorted(set(statuses))}")
+    if latencies:
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+        print(f"/auth/login w tym czasie: {len(latencies)} żądań, "
+              f"mediana {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+              f"max {latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Benchmark: silnik tworzony na każde żądanie vs jeden współdzielony silnik.
+
+Symuluje zapytanie z /auth/login pod równoległym obciążeniem i wypisuje żądania/s.
+Wymaga działającej bazy skonfigurowanej w .env (DB_USER, DB_PASS, DB_HOST, DB_NAME).
+
+    cd backend
+    python -m benchmarks.bench_metadata_engine --requests 500 --concurrency 16
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import database
+import models
+from config import Settings
+
+
+async def per_request(settings: Settings, username: str):
+    # Stare zachowanie get_engine(): nowy silnik + create_all + dispose
+    engine = create_async_engine(database.metadata_url(settings))
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        async with AsyncSession(engine) as session:
+            await session.execute(select(models.User).where(models.User.username == username))
+    finally:
+        await engine.dispose()
+
+
+async def shared(settings: Settings, username: str):
+    engine = database.get_metadata_engine()
+    async with AsyncSession(engine) as session:
+        await session.execute(select(models.User).where(models.User.username == username))
+
+
+async def run(name, fn, settings, requests, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with limit:
+            await fn(settings, f"bench-{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {requests} żądań w {elapsed:.2f}s -> {requests / elapsed:.1f} req/s")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    settings = Settings()
+    await database.init_engine(settings)
+    try:
+        await run("przed", per_request, settings, args.requests, args.concurrency)
+        await run("po", shared, settings, args.requests, args.concurrency)
+    finally:
+        await database.dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Benchmark formatów odpowiedzi /run: rozmiar i czas serializacji.
+
+Porównuje obecny JSON (lista słowników) z JSON kolumnowym, Arrow IPC i Parquet
+na syntetycznym wyniku (bez bazy danych).
+
+    cd backend
+    python -m benchmarks.bench_result_encoding --rows 100000 --columns 20
+"""
+import argparse
+import datetime
+import decimal
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+import encoding
+
+
+def make_rows(rows: int, columns: int):
+    names = [f"column_name_{i}" for i in range(columns)]
+    base = datetime.datetime(2024, 1, 1)
+    data = []
+    for r in range(rows):
+        row = []
+        for c in range(columns):
+            kind = c % 4
+            if kind == 0:
+                row.append(r * columns + c)
+            elif kind == 1:
+                row.append(f"value-{r}-{c}")
+            elif kind == 2:
+                row.append(decimal.Decimal(r) / 100)
+            else:
+                row.append(base + datetime.timedelta(seconds=r))
+        data.append(tuple(row))
+    return names, data
+
+
+def records_json(columns, rows) -> bytes:
+    # To, co robił /run dotąd: dict na wiersz + jsonable_encoder FastAPI
+    return json.dumps(jsonable_encoder({"columns": columns, "data": encoding.to_records(columns, rows)})).encode()
+
+
+def measure(name, fn, columns, rows, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(columns, rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<16} {len(body) / 1024 / 1024:8.2f} MB {best * 1000:10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    columns, rows = make_rows(args.rows, args.columns)
+    print(f"{args.rows} wierszy x {args.columns} kolumn")
+    measure("json (wiersze)", records_json, columns, rows, args.repeat)
+    measure("json kolumnowy", encoding.columnar_json, columns, rows, args.repeat)
+    if encoding.arrow_available():
+        measure("arrow ipc", encoding.arrow_ipc, columns, rows, args.repeat)
+        measure("parquet", encoding.parquet, columns, rows, args.repeat)
+    else:
+        print("pyarrow nie jest zainstalowany - pomijam Arrow i Parquet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Benchmark całego backendu: scenariusze login, schema, ask, run i history pod obciążeniem.
+Dla każdego endpointu: p50/p95/p99, żądania/s, błędy i szczytowe RSS procesu backendu.
+
+Najprościej z --spawn: skrypt sam odpala zastępczą Ollamę (benchmarks.fake_ollama) i uvicorn
+z main:app (baza metadanych jak zwykle z .env / DB_*), a baza klienta to plik SQLite z seed_target:
+
+    cd backend
+    python -m benchmarks.seed_target --url sqlite:////tmp/bench-target.db --tables 5000
+    python -m benchmarks.bench_suite --spawn --target-db /tmp/bench-target.db --duration 10 --concurrency 16
+
+Baza SQLite jako projekt wymaga ALLOW_SQLITE_TARGETS=true (--spawn ustawia to sam).
+
+Do działającego backendu (RSS tylko gdy podamy pid):
+
+    python -m benchmarks.bench_suite --url http://127.0.0.1:8000 --backend-pid 1234 \\
+        --target-type postgres --target-host localhost --target-port 5432 --target-db bench \\
+        --target-user postgres --target-password haslo
+
+--save wyniki.json zapisuje wyniki, --baseline wyniki.json porównuje z poprzednimi
+i kończy się kodem 1, gdy p95 któregoś scenariusza wzrósł o więcej niż --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+SCENARIOS = ("login", "schema", "ask", "run", "history")
+
+
+class Setup:
+    def __init__(self, username: str, password: str, user_id: int, project_id: int):
+        self.username = username
+        self.password = password
+        self.user_id = user_id
+        self.project_id = project_id
+
+
+def scenario_request(name: str, setup: Setup):
+    """(metoda, ścieżka, body) jednego żądania scenariusza."""
+    project = setup.project_id
+    if name == "login":
+        return "POST", "/auth/login", {"username": setup.username, "password": setup.password}
+    if name == "schema":
+        return "GET", f"/projects/{project}/schema", None
+    if name == "ask":
+        # Różne pytania, żeby nie mierzyć samego cache wygenerowanych zapytań
+        return "POST", f"/projects/{project}/ask", {"question": f"Ile jest obiektów {uuid.uuid4().hex[:8]}?"}
+    if name == "run":
+        return "POST", f"/projects/{project}/run", {"sql": "SELECT * FROM t0000", "page_size": 100}
+    if name == "history":
+        return "GET", f"/projects/{project}/history", None
+    raise ValueError(name)
+
+
+def read_rss(pid: int | None) -> int | None:
+    """Bieżące RSS procesu w bajtach (Linux, /proc)."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+async def run_scenario(http: httpx.AsyncClient, name: str, setup: Setup, duration: float,
+                       concurrency: int, pid: int | None) -> dict:
+    latencies = []
+    errors = 0
+    peak_rss = read_rss(pid)
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            method, path, body = scenario_request(name, setup)
+            start = time.perf_counter()
+            try:
+                response = await http.request(method, path, json=body)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while time.perf_counter() < deadline:
+            rss = read_rss(pid)
+            if rss is not None:
+                peak_rss = max(peak_rss or 0, rss)
+            await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(sample_rss(), *(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": ms(percentile(latencies, 0.5)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1) if peak_rss else None,
+    }
+
+
+async def prepare(http: httpx.AsyncClient, args) -> Setup:
+    """Zakłada użytkownika i projekt wskazujący na bazę testową."""
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    password = "bench"
+    response = await http.post("/auth/register", json={"username": username, "email": f"{username}@bench", "password": password})
+    response.raise_for_status()
+    user_id = (await http.post("/auth/login", json={"username": username, "password": password})).json()["id"]
+
+    response = await http.post(f"/projects/{user_id}", json={
+        "name": "benchmark",
+        "dbType": args.target_type,
+        "dbHost": args.target_host,
+        "dbPort": args.target_port,
+        "dbName": args.target_db,
+        "dbUser": args.target_user,
+        "dbPassword": args.target_password,
+    })
+    response.raise_for_status()
+    projects = (await http.get(f"/projects/{user_id}")).json()
+    return Setup(username, password, user_id, projects[-1]["id"])
+
+
+def spawn(args) -> tuple[list[subprocess.Popen], int]:
+    """Odpala zastępczą Ollamę i backend; zwraca procesy i pid backendu."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ollama = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_ollama", "--port", str(args.ollama_port),
+        "--latency", str(args.llm_latency), "--tokens-per-sec", str(args.llm_tokens_per_sec),
+    ], cwd=backend_dir)
+    env = dict(os.environ, OLLAMA_URL=f"http://127.0.0.1:{args.ollama_port}",
+               OLLAMA_USER="bench", OLLAMA_PASS="bench", OLLAMA_MODEL="bench",
+               ALLOW_SQLITE_TARGETS="true" if args.target_type == "sqlite" else "false")
+    port = httpx.URL(args.url).port or 8000
+    backend = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+    ], cwd=backend_dir, env=env)
+    return [backend, ollama], backend.pid
+
+
+async def wait_ready(url: str, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=url) as http:
+        while time.perf_counter() < deadline:
+            try:
+                await http.get("/metrics")
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Backend {url} nie wstał w {timeout}s")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before or not before.get("p95_ms") or current.get("p95_ms") is None:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {current['p95_ms']} ms")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="odpal fake Ollamę i backend")
+    parser.add_argument("--backend-pid", type=int, help="pid backendu do pomiaru RSS (bez --spawn)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10, help="sekundy na scenariusz")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--target-type", default="sqlite", choices=("sqlite", "postgres", "mysql"))
+    parser.add_argument("--target-db", default="/tmp/bench-target.db")
+    parser.add_argument("--target-host", default="localhost")
+    parser.add_argument("--target-port", type=int, default=0)
+    parser.add_argument("--target-user", default="")
+    parser.add_argument("--target-password", default="")
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=40)
+    parser.add_argument("--save", help="zapisz wyniki do pliku JSON")
+    parser.add_argument("--baseline", help="porównaj z wynikami z pliku JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="dopuszczalny wzrost p95 (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    processes = []
+    pid = args.backend_pid
+    if args.spawn:
+        processes, pid = spawn(args)
+    try:
+        await wait_ready(args.url)
+        limits = httpx.Limits(max_connections=args.concurrency + 4)
+        async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits) as http:
+            setup = await prepare(http, args)
+            results = {}
+            print(f"{'scenariusz':<10} {'żądania':>8} {'błędy':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>8}")
+            for name in args.scenarios.split(","):
+                result = await run_scenario(http, name, setup, args.duration, args.concurrency, pid)
+                results[name] = result
+                print(f"{name:<10} {result['requests']:>8} {result['errors']:>6} {result['rps']:>8} "
+                      f"{result['p50_ms']!s:>8} {result['p95_ms']!s:>8} {result['p99_ms']!s:>8} {result['peak_rss_mb']!s:>8}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESJA {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
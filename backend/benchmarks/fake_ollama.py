@@ -0,0 +1,89 @@
+"""
+Zastępczy serwer Ollamy do benchmarków: /api/chat z konfigurowalnym opóźnieniem i tempem tokenów.
+
+    cd backend
+    python -m benchmarks.fake_ollama --port 11500 --latency 0.5 --tokens-per-sec 40 --tokens 30
+
+Odpowiedź to zawsze --sql (rozbite na --tokens fragmentów), z polami eval_count/eval_duration jak w Ollamie.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI()
+options = {"latency": 0.5, "tokens_per_sec": 40.0, "tokens": 30, "sql": "SELECT COUNT(*) FROM t0000"}
+stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def split_tokens(text: str, count: int) -> list[str]:
+    size = max(1, -(-len(text) // count))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def final_chunk(prompt_chars: int, started: float) -> dict:
+    return {
+        "done": True,
+        "prompt_eval_count": prompt_chars // 4,
+        "eval_count": options["tokens"],
+        "prompt_eval_duration": int(options["latency"] * 1e9),
+        "eval_duration": int((time.perf_counter() - started - options["latency"]) * 1e9),
+    }
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    prompt_chars = sum(len(message.get("content", "")) for message in body.get("messages", []))
+    started = time.perf_counter()
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    tokens = split_tokens(options["sql"], options["tokens"])
+    delay = 1 / options["tokens_per_sec"] if options["tokens_per_sec"] > 0 else 0
+
+    if not body.get("stream"):
+        try:
+            await asyncio.sleep(options["latency"] + delay * len(tokens))
+        finally:
+            stats["in_flight"] -= 1
+        return {"message": {"role": "assistant", "content": options["sql"]}, **final_chunk(prompt_chars, started)}
+
+    async def stream():
+        try:
+            await asyncio.sleep(options["latency"])
+            for token in tokens:
+                yield json.dumps({"message": {"role": "assistant", "content": token}, "done": False}) + "\n"
+                await asyncio.sleep(delay)
+            yield json.dumps({"message": {"role": "assistant", "content": ""}, **final_chunk(prompt_chars, started)}) + "\n"
+        finally:
+            stats["in_flight"] -= 1
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/stats")
+async def get_stats():
+    """Ile wywołań doszło do "Ollamy" i ile maksymalnie naraz (przydatne przy single-flight/kolejce)."""
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.5, help="sekundy do pierwszego tokenu")
+    parser.add_argument("--tokens-per-sec", type=float, default=40)
+    parser.add_argument("--tokens", type=int, default=30)
+    parser.add_argument("--sql", default=options["sql"])
+    args = parser.parse_args()
+    options.update(latency=args.latency, tokens_per_sec=args.tokens_per_sec, tokens=args.tokens, sql=args.sql)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
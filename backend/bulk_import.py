@@ -0,0 +1,182 @@
+import csv
+import datetime
+import decimal
+import io
+
+from sqlalchemy import text
+
+from encoding import pq
+
+# Import plików CSV/Parquet do tabel baz klientów. Plik jest czytany paczkami, więc pamięć
+# nie zależy od jego rozmiaru. Postgres dostaje dane przez COPY FROM STDIN, inne bazy
+# przez wielowierszowe INSERT-y (executemany).
+
+CSV = "csv"
+PARQUET = "parquet"
+
+
+def detect_format(content_type: str | None, filename: str | None) -> str | None:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    name = (filename or "").lower()
+    if content_type in ("application/vnd.apache.parquet", "application/x-parquet") or name.endswith(".parquet"):
+        return PARQUET
+    if content_type in ("text/csv", "application/csv", "text/plain") or name.endswith((".csv", ".txt")):
+        return CSV
+    return None
+
+
+def read_columns(path: str, file_format: str, delimiter: str = ",") -> list[str]:
+    """Nazwy kolumn pliku: nagłówek CSV albo schemat Parquet."""
+    if file_format == PARQUET:
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [name.strip() for name in next(csv.reader(f, delimiter=delimiter), [])]
+
+
+def read_batches(path: str, file_format: str, batch_rows: int, delimiter: str = ","):
+    """Paczki wierszy pliku (bez nagłówka), po maksymalnie batch_rows."""
+    if file_format == PARQUET:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+            yield list(zip(*(column.to_pylist() for column in batch.columns)))
+        return
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        next(reader, None)
+        batch = []
+        for row in reader:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _to_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "t", "true", "y", "yes", "on")
+
+
+def _converter(col_type: str):
+    """Funkcja zamieniająca tekst z CSV na wartość Pythona dla typu kolumny ze schematu."""
+    col_type = col_type.upper()
+    if "INT" in col_type and "INTERVAL" not in col_type and "POINT" not in col_type:
+        # TINYINT(1) to w MySQL zwykle boolean zapisany jako 0/1
+        return int if col_type != "TINYINT(1)" else lambda v: int(_to_bool(v))
+    if col_type.startswith(("NUMERIC", "DECIMAL")):
+        return decimal.Decimal
+    if col_type.startswith(("REAL", "DOUBLE", "FLOAT")):
+        return float
+    if col_type.startswith("BOOL"):
+        return _to_bool
+    if col_type.startswith("TIMESTAMP") or col_type.startswith("DATETIME"):
+        return datetime.datetime.fromisoformat
+    if col_type == "DATE":
+        return datetime.date.fromisoformat
+    return None
+
+
+def _is_text(col_type: str) -> bool:
+    col_type = col_type.upper()
+    return any(word in col_type for word in ("CHAR", "TEXT", "CLOB", "STRING"))
+
+
+def make_converters(table_columns: list[tuple[str, str]], columns: list[str]) -> list:
+    """
+    Konwertery dla kolumn pliku na podstawie typów z (cache'owanego) schematu tabeli.
+    Pusty tekst to NULL, poza kolumnami tekstowymi.
+    """
+    types = {name.lower(): col_type for name, col_type in table_columns}
+    converters = []
+    for name in columns:
+        col_type = types[name.lower()]
+        convert = _converter(col_type)
+        keep_empty = _is_text(col_type)
+
+        def convert_value(value, convert=convert, keep_empty=keep_empty):
+            if value is None or not isinstance(value, str):
+                return value
+            if value == "" and not keep_empty:
+                return None
+            return convert(value) if convert else value
+
+        converters.append(convert_value)
+    return converters
+
+
+_NULL = "\\N"
+
+
+def _apply(convert, value):
+    return convert(value)
+
+
+class _CopyReader(io.TextIOBase):
+    """
+    Plik tylko do odczytu dla copy_expert: paczki wierszy są zamieniane na CSV dopiero
+    gdy COPY poprosi o kolejne dane, więc w pamięci jest co najwyżej jedna paczka.
+    """
+
+    def __init__(self, batches, converters: list, on_batch):
+        self._batches = iter(batches)
+        self._converters = converters
+        self._on_batch = on_batch
+        self._buffer = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            batch = next(self._batches, None)
+            if batch is None:
+                break
+            out = io.StringIO()
+            csv.writer(out, lineterminator="\n").writerows(
+                [_NULL if value is None else value for value in map(_apply, self._converters, row)]
+                for row in batch
+            )
+            self._buffer += out.getvalue()
+            self._on_batch(len(batch))
+        if size < 0:
+            data, self._buffer = self._buffer, ""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readline(self, size: int = -1) -> str:
+        return self.read(size if size > 0 else 8192)
+
+
+def copy_postgres(conn, table: str, columns: list[str], batches, converters: list, on_batch) -> int:
+    """COPY FROM STDIN w formacie CSV. NULL to \\N, dzięki czemu pusty tekst zostaje pustym tekstem."""
+    quote = conn.dialect.identifier_preparer.quote
+    statement = "COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(
+        quote(table), ", ".join(quote(name) for name in columns)
+    )
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(statement, _CopyReader(batches, converters, on_batch))
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def insert_batches(conn, table: str, columns: list[str], batches, converters: list, on_batch) -> int:
+    """Wielowierszowe INSERT-y: executemany na paczce (pymysql skleja je w jeden INSERT ... VALUES)."""
+    quote = conn.dialect.identifier_preparer.quote
+    statement = text("INSERT INTO {} ({}) VALUES ({})".format(
+        quote(table),
+        ", ".join(quote(name) for name in columns),
+        ", ".join(f":c{i}" for i in range(len(columns)))
+    ))
+    rows = 0
+    for batch in batches:
+        params = [
+            {f"c{i}": convert(value) for i, (convert, value) in enumerate(zip(converters, row))}
+            for row in batch
+        ]
+        conn.execute(statement, params)
+        rows += len(batch)
+        on_batch(len(batch))
+    return rows
@@ -1,5 +1,12 @@
+import json
+
+import httpx
 import requests
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
 
 
 class Client(BaseModel):
@@ -7,12 +14,112 @@ class Client(BaseModel):
     login: str
     password: str
     url: str
-    def chat(self, messages):
-        payload = {
+    # Timeouty w sekundach: nawiązanie połączenia i czekanie na kolejne bajty odpowiedzi
+    connect_timeout: float = 5
+    read_timeout: float = 300
+    retries: int = 2
+    pool_size: int = 10
+
+    # Sesje trzymają otwarte połączenia (keep-alive) do Ollamy między wywołaniami
+    _session: requests.Session | None = PrivateAttr(default=None)
+    _http: httpx.AsyncClient | None = PrivateAttr(default=None)
+
+    def _payload(self, messages, stream: bool) -> dict:
+        return {
             "model": self.model,
             "messages": messages,
-            "stream": False
+            "stream": stream
         }
-        response = requests.post(f"{self.url}/api/chat", json=payload, auth=(self.login, self.password))
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            session = requests.Session()
+            session.auth = (self.login, self.password)
+            # Ponawiamy tylko błędy połączenia i 502/503/504 (np. restart Ollamy)
+            retry = Retry(
+                total=self.retries,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=None,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                auth=(self.login, self.password),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                # httpx ponawia tylko nieudane nawiązanie połączenia
+                transport=httpx.AsyncHTTPTransport(retries=self.retries),
+            )
+        return self._http
+
+    def chat(self, messages):
+        response = self.session.post(
+            f"{self.url}/api/chat",
+            json=self._payload(messages, False),
+            timeout=(self.connect_timeout, self.read_timeout)
+        )
         response_json = response.json()
-        return response_json
\ No newline at end of file
+        metrics.record_llm_response(response_json)
+        return response_json
+
+    def chat_stream(self, messages):
+        """Zwraca kolejne fragmenty odpowiedzi (tokeny) ze strumienia NDJSON Ollamy."""
+        with self.session.post(
+            f"{self.url}/api/chat",
+            json=self._payload(messages, True),
+            timeout=(self.connect_timeout, self.read_timeout),
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("message", {}).get("content")
+                if token:
+                    yield token
+                if chunk.get("done"):
+                    # Ostatni fragment niesie statystyki generacji
+                    metrics.record_llm_response(chunk)
+                    break
+
+    async def achat(self, messages):
+        """Asynchroniczna wersja chat() - czekanie na generację nie blokuje wątku."""
+        response = await self.http.post(f"{self.url}/api/chat", json=self._payload(messages, False))
+        response_json = response.json()
+        metrics.record_llm_response(response_json)
+        return response_json
+
+    async def achat_stream(self, messages):
+        """Asynchroniczna wersja chat_stream()."""
+        async with self.http.stream("POST", f"{self.url}/api/chat", json=self._payload(messages, True)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("message", {}).get("content")
+                if token:
+                    yield token
+                if chunk.get("done"):
+                    # Ostatni fragment niesie statystyki generacji
+                    metrics.record_llm_response(chunk)
+                    break
+
+    async def aclose(self):
+        """Zamyka otwarte połączenia (wołane przy wyłączaniu aplikacji)."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
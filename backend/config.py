@@ -11,6 +11,58 @@ class Settings(BaseSettings):
     ollama_model: str
     ollama_user: str
     ollama_pass: str
+    ollama_connect_timeout: float = 5 # sekundy
+    ollama_read_timeout: float = 300 # sekundy między kolejnymi bajtami odpowiedzi
+    ollama_retries: int = 2
+    ollama_pool_size: int = 10 # połączenia keep-alive do Ollamy
+    ollama_parallel: int = 1 # równoczesne generacje (OLLAMA_NUM_PARALLEL serwera), reszta czeka w kolejce
+    # Pula połączeń do wewnętrznej bazy (jedna na proces)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_recycle: int = 1800 # sekundy
+    # Silniki do baz klientów (jeden na projekt, LRU + TTL)
+    target_engine_cache_size: int = 32
+    target_engine_ttl: int = 900 # sekundy bez użycia
+    target_pool_size: int = 5
+    target_max_overflow: int = 5
+    # Projekty z plikiem SQLite na serwerze API (tylko benchmarki/testy - dbName to dowolna ścieżka)
+    allow_sqlite_targets: bool = False
+    schema_cache_ttl: int = 300 # sekundy, potem schemat jest pobierany ponownie
+    run_max_rows: int = 10000 # twardy limit wierszy zwracanych przez /run
+    run_statement_timeout_ms: int = 30000 # domyślny limit czasu zapytania na bazie klienta
+    run_max_concurrent: int = 4 # równoległe zapytania per projekt
+    run_max_queue: int = 8 # ile zapytań może czekać w kolejce, potem 429
+    # Domyślne progi preflight (EXPLAIN), gdy projekt nie ma własnych
+    preflight_max_cost: float = 1000000
+    preflight_max_rows: int = 1000000
+    # Zadania w tle (POST /projects/{id}/jobs)
+    jobs_spool_dir: str = "/tmp/sqlhelper-jobs"
+    jobs_workers: int = 4
+    jobs_ttl: int = 3600 # sekundy od zakończenia, potem wyniki są usuwane
+    jobs_statement_timeout_ms: int = 3600000
+    # Import plików (POST /projects/{id}/import)
+    import_max_bytes: int = 1024 * 1024 * 1024
+    import_batch_rows: int = 10000
+    export_batch_rows: int = 10000 # wiersze pobierane z kursora naraz przy /export
+    # Historia zapytań: domyślna/maksymalna strona i przenoszenie starych wpisów do sql_history_archive
+    history_page_size: int = 100
+    history_max_page_size: int = 500
+    history_retention_days: int = 0 # 0 = bez archiwizacji
+    history_archive_interval: int = 3600 # sekundy między przebiegami archiwizacji
+    history_archive_batch: int = 1000
+    # Telemetria historii (czasy LLM/wykonania) zapisywana paczkami w tle
+    telemetry_flush_interval: float = 2 # sekundy
+    telemetry_batch: int = 200
+    sql_cache_size: int = 1024 # wpisy w cache wygenerowanych zapytań
+    # Cache wyników SELECT-ów z /run (włączany per projekt przez result_cache_ttl)
+    result_cache_max_bytes: int = 256 * 1024 * 1024 # wyniki trzymane w pamięci
+    result_cache_spill_bytes: int = 1024 * 1024 # większe wyniki idą na dysk
+    result_cache_dir: str = "/tmp/sqlhelper-results"
+    result_cache_disk_bytes: int = 2 * 1024 * 1024 * 1024
+    # Przycinanie schematu w prompcie: najlepiej pasujące tabele + sąsiedzi po kluczach obcych
+    schema_prompt_top_k: int = 15
+    schema_prompt_token_budget: int = 6000
+    server_timing: bool = False # dokłada nagłówek Server-Timing z czasami etapów
     model_config = SettingsConfigDict(
         env_file=".env",
         env_ignore_empty=True,
@@ -0,0 +1,66 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+import models
+from config import Settings
+
+# Jeden silnik (i jedna pula połączeń) do wewnętrznej bazy na cały proces.
+# Tworzony raz przy starcie aplikacji (lifespan w main.py), zamykany przy wyłączaniu.
+# Sterownik asyncpg - endpointy nie blokują wątków czekając na bazę.
+_engine: AsyncEngine | None = None
+
+# create_all nie dodaje kolumn ani indeksów do istniejących tabel,
+# więc zmiany w modelach dokładamy tutaj (idempotentnie, tylko postgres)
+_UPGRADES = [
+    "ALTER TABLE sql_history ADD COLUMN IF NOT EXISTS schema_fingerprint VARCHAR(64)",
+    "ALTER TABLE sql_history ADD COLUMN IF NOT EXISTS question_key VARCHAR(40)",
+    "CREATE INDEX IF NOT EXISTS ix_sql_history_question_key ON sql_history (project_id, question_key)",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS statement_timeout_ms INTEGER",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS result_cache_ttl INTEGER",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS preflight_mode VARCHAR(16)",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS preflight_max_cost DOUBLE PRECISION",
+    "ALTER TABLE projects ADD COLUMN IF NOT EXISTS preflight_max_rows INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_sql_history_project_created ON sql_history (project_id, created_at, id)",
+    # Wyszukiwanie pełnotekstowe w historii (?q=); wyrażenie musi być identyczne jak w history.search_condition
+    "CREATE INDEX IF NOT EXISTS ix_sql_history_fts ON sql_history USING GIN "
+    "(to_tsvector('simple', coalesce(question, '') || ' ' || coalesce(generated_sql, '')))",
+]
+
+
+def metadata_url(settings: Settings) -> str:
+    return f"postgresql+asyncpg://{settings.db_user}:{settings.db_pass}@{settings.db_host}/{settings.db_name}"
+
+
+async def init_engine(settings: Settings) -> AsyncEngine:
+    """Tworzy współdzielony silnik i jednorazowo zakłada tabele."""
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    _engine = create_async_engine(
+        metadata_url(settings),
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+    )
+    # Tworzymy tabele tylko raz, a nie przy każdym żądaniu
+    async with _engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            for statement in _UPGRADES:
+                await conn.execute(text(statement))
+    return _engine
+
+
+def get_metadata_engine() -> AsyncEngine:
+    if _engine is None:
+        raise RuntimeError("Silnik bazy nie został zainicjalizowany (init_engine).")
+    return _engine
+
+
+async def dispose_engine():
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
@@ -0,0 +1,155 @@
+import hashlib
+import json
+
+# Formaty odpowiedzi /run wybierane nagłówkiem Accept.
+# Domyślny JSON (lista słowników) powtarza nazwy kolumn w każdym wierszu - formaty kolumnowe nie.
+RECORDS = "application/json"
+COLUMNAR = "application/vnd.sqlhelper.columnar+json"
+ARROW = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # pyarrow jest opcjonalny - bez niego działają tylko formaty JSON
+    pa = None
+    pq = None
+
+
+def negotiate(accept: str | None) -> str:
+    """Wybiera format z nagłówka Accept (pierwszy znany, w kolejności z nagłówka)."""
+    for part in (accept or "").split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in (COLUMNAR, ARROW, PARQUET):
+            return media_type
+        if media_type == "application/x-parquet":
+            return PARQUET
+        if media_type in (RECORDS, "*/*", "application/*"):
+            return RECORDS
+    return RECORDS
+
+
+def etag(body: bytes) -> str:
+    """Silny ETag z treści odpowiedzi."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, current: str) -> bool:
+    """Czy nagłówek If-None-Match (lista ETagów, także słabych W/"..." albo *) pasuje do current."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or current in tags
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def to_records(columns: list[str], rows) -> list[dict]:
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def to_columns(columns: list[str], rows) -> list[list]:
+    """Transpozycja całej paczki naraz: lista wartości na kolumnę, w kolejności columns."""
+    if not rows:
+        return [[] for _ in columns]
+    return [list(values) for values in zip(*rows)]
+
+
+def columnar_json(columns: list[str], rows, **extra) -> bytes:
+    body = {"columns": columns, "data": to_columns(columns, rows), **extra}
+    return json.dumps(body, default=str).encode()
+
+
+def _text(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode(errors="replace")
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def arrow_column(values: list, arrow_type=None):
+    """
+    Kolumna Arrow z listy wartości. Bez arrow_type typ zgadujemy z danych (mieszane typy -> tekst),
+    z arrow_type wartości muszą do niego pasować (pa.ArrowInvalid / pa.ArrowTypeError, gdy nie).
+    """
+    if arrow_type is None:
+        try:
+            return pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Kolumny o mieszanych typach wysyłamy jako tekst
+            return arrow_column(values, pa.string())
+    if pa.types.is_string(arrow_type):
+        return pa.array([None if v is None else _text(v) for v in values], type=arrow_type)
+    if pa.types.is_binary(arrow_type):
+        return pa.array([None if v is None else bytes(v) for v in values], type=arrow_type)
+    return pa.array(values, type=arrow_type)
+
+
+def to_arrow_table(columns: list[str], rows, types: list | None = None):
+    """types: typ Arrow na kolumnę albo None (zgadywany z danych), jak z arrow_types."""
+    types = types or [None] * len(columns)
+    arrays = [arrow_column(values, arrow_type) for values, arrow_type in zip(to_columns(columns, rows), types)]
+    return pa.Table.from_arrays(arrays, names=list(columns))
+
+
+# Typy kolumn z opisu kursora: OID-y postgresa i FIELD_TYPE z MySQL. Typów spoza tych list
+# (tablice, bloby, typy użytkownika) i kolumn SQLite, który typów nie podaje, nie znamy.
+_PG_TYPES = {
+    16: "bool", 20: "int", 21: "int", 23: "int", 26: "int", 700: "float", 701: "float",
+    1700: "decimal", 25: "text", 19: "text", 1042: "text", 1043: "text", 2950: "text",
+    114: "text", 3802: "text", 142: "text", 17: "binary", 1082: "date", 1083: "time",
+    1114: "timestamp", 1184: "timestamptz", 1186: "interval",
+}
+_MYSQL_TYPES = {
+    1: "int", 2: "int", 3: "int", 8: "int", 9: "int", 13: "int", 4: "float", 5: "float",
+    0: "decimal", 246: "decimal", 15: "text", 245: "text", 247: "text", 248: "text",
+    253: "text", 254: "text", 16: "binary", 10: "date", 14: "date", 7: "timestamp",
+    12: "timestamp", 11: "interval",
+}
+
+
+def _declared_type(kind: str | None, precision, scale):
+    if kind == "decimal":
+        # numeric bez precyzji (np. avg() w postgresie) nie zmieści się pewnie w decimal128
+        if precision is None or scale is None or not 0 <= scale <= precision <= 38:
+            return pa.string()
+        return pa.decimal128(38, scale)
+    return {
+        "bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(), "text": pa.string(),
+        "binary": pa.binary(), "date": pa.date32(), "time": pa.time64("us"),
+        "timestamp": pa.timestamp("us"), "timestamptz": pa.timestamp("us", tz="UTC"),
+        "interval": pa.duration("us"),
+    }.get(kind)
+
+
+def arrow_types(dialect: str, column_types: list) -> list:
+    """
+    Typy Arrow kolumn wyniku z (type_code, precision, scale) opisu kursora (services.stream_query);
+    None tam, gdzie typu nie znamy i trzeba go zgadnąć z danych.
+    """
+    names = {"postgresql": _PG_TYPES, "mysql": _MYSQL_TYPES}.get(dialect, {})
+    types = []
+    for type_code, precision, scale in column_types:
+        kind = names.get(type_code) if isinstance(type_code, int) else None
+        types.append(_declared_type(kind, precision, scale))
+    return types
+
+
+def arrow_ipc(columns: list[str], rows) -> bytes:
+    table = to_arrow_table(columns, rows)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def parquet(columns: list[str], rows) -> bytes:
+    table = to_arrow_table(columns, rows)
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
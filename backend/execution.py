@@ -0,0 +1,140 @@
+import asyncio
+import threading
+from collections import defaultdict, deque
+
+from sqlalchemy import event, text
+
+# Kontrola wykonywania zapytań na bazach klientów:
+# timeouty per dialekt, anulowanie działających zapytań i limit równoległych wykonań per projekt.
+
+
+def apply_statement_timeout(conn, timeout_ms: int | None):
+    """Ustawia limit czasu zapytania na połączeniu (postgres: na bieżącą transakcję)."""
+    if not timeout_ms:
+        return
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+    elif dialect == "mysql":
+        # MySQL ogranicza w ten sposób tylko SELECT-y. Ustawienie sesji zostaje na połączeniu
+        # w puli, więc reset_session_timeout przywraca domyślne przy oddaniu połączenia
+        conn.execute(text(f"SET SESSION max_execution_time = {int(timeout_ms)}"))
+        conn.connection.info["session_timeout"] = True
+
+
+def install_session_reset(engine):
+    """Przy oddawaniu połączenia do puli zdejmuje timeout ustawiony przez apply_statement_timeout (MySQL)."""
+    if engine.dialect.name != "mysql":
+        return
+
+    @event.listens_for(engine, "checkin")
+    def reset_session_timeout(dbapi_connection, connection_record):
+        if dbapi_connection is None or not connection_record.info.pop("session_timeout", False):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SET SESSION max_execution_time = DEFAULT")
+        finally:
+            cursor.close()
+
+
+def backend_id(conn) -> int | None:
+    """
+    Id procesu/połączenia po stronie bazy, potrzebne do anulowania zapytania.
+    Nie zmienia się przez życie połączenia, więc pytamy bazę raz na połączenie z puli.
+    """
+    info = conn.connection.info
+    if "backend_id" not in info:
+        dialect = conn.dialect.name
+        if dialect == "postgresql":
+            info["backend_id"] = conn.execute(text("SELECT pg_backend_pid()")).scalar()
+        elif dialect == "mysql":
+            info["backend_id"] = conn.execute(text("SELECT CONNECTION_ID()")).scalar()
+        else:
+            info["backend_id"] = None
+    return info["backend_id"]
+
+
+class RunningQueries:
+    """Rejestr działających zapytań: query_id -> (projekt, silnik, id po stronie bazy)."""
+
+    def __init__(self):
+        self._queries: dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def add(self, query_id: str, project_id: int, engine, conn):
+        pid = backend_id(conn)
+        with self._lock:
+            self._queries[query_id] = (project_id, engine, pid)
+
+    def remove(self, query_id: str):
+        with self._lock:
+            self._queries.pop(query_id, None)
+
+    def cancel(self, project_id: int, query_id: str) -> bool:
+        """Anuluje zapytanie osobnym połączeniem. False gdy takie zapytanie nie działa."""
+        with self._lock:
+            entry = self._queries.get(query_id)
+        if entry is None or entry[0] != project_id or entry[2] is None:
+            return False
+
+        _, engine, pid = entry
+        with engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": pid})
+            else:
+                conn.execute(text(f"KILL QUERY {int(pid)}"))
+        return True
+
+
+class QueueFull(Exception):
+    def __init__(self, position: int):
+        super().__init__(f"Kolejka zapytań projektu jest pełna (pozycja {position})")
+        self.position = position
+
+
+class ProjectLimiter:
+    """
+    Limit równoległych wykonań per projekt. Ponad limit żądania czekają w kolejce FIFO
+    (do max_queue), a gdy i kolejka jest pełna - QueueFull z pozycją, którą żądanie by zajęło.
+    Używany tylko z pętli zdarzeń, więc nie potrzebuje locków.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 8):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._running: dict[int, int] = defaultdict(int)
+        self._waiting: dict[int, deque] = defaultdict(deque)
+
+    async def acquire(self, project_id: int):
+        waiting = self._waiting[project_id]
+        if self._running[project_id] < self.max_concurrent and not waiting:
+            self._running[project_id] += 1
+            return
+
+        if len(waiting) >= self.max_queue:
+            raise QueueFull(len(waiting) + 1)
+
+        future = asyncio.get_running_loop().create_future()
+        waiting.append(future)
+        try:
+            # Slot przekazuje nam release() - licznik running się nie zmienia
+            await future
+        except asyncio.CancelledError:
+            if future in waiting:
+                waiting.remove(future)
+            elif future.done() and not future.cancelled():
+                self.release(project_id)
+            raise
+
+    def release(self, project_id: int):
+        waiting = self._waiting[project_id]
+        while waiting:
+            future = waiting.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running[project_id] -= 1
+
+    def stats(self, project_id: int) -> dict:
+        return {"running": self._running[project_id], "queued": len(self._waiting[project_id])}
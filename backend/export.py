@@ -0,0 +1,193 @@
+import csv
+import io
+import json
+import time
+import zlib
+
+import encoding
+import metrics
+
+try:
+    import zstandard
+except ImportError: # zstd jest opcjonalny - bez niego zostaje gzip
+    zstandard = None
+
+# Eksport wyników zapytania do pliku strumieniem: paczki wierszy z kursora po stronie serwera
+# są od razu kodowane (CSV / NDJSON / Parquet) i kompresowane, bez trzymania całego wyniku.
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": (encoding.PARQUET, "parquet"),
+}
+COMPRESSIONS = {"none": None, "gzip": "gz", "zstd": "zst"}
+
+# Parquet: wiersze zbierane do jednej grupy (row group), żeby plik nie miał tysięcy małych grup
+PARQUET_ROW_GROUP = 50000
+
+export_rows = metrics.register(metrics.Counter(
+    "sqlhelper_export_rows_total", "Wiersze wyeksportowane przez /export.", ("format",)
+))
+export_bytes = metrics.register(metrics.Counter(
+    "sqlhelper_export_bytes_total", "Bajty wysłane przez /export (po kompresji).", ("format",)
+))
+export_throughput = metrics.register(metrics.Histogram(
+    "sqlhelper_export_rows_per_second", "Przepustowość pojedynczego eksportu.", ("format",),
+    buckets=(1000, 5000, 10000, 50000, 100000, 250000, 500000, 1000000)
+))
+
+
+def compression_available(compression: str) -> bool:
+    return compression != "zstd" or zstandard is not None
+
+
+def filename(fmt: str, compression: str) -> str:
+    name = f"export.{FORMATS[fmt][1]}"
+    return f"{name}.{COMPRESSIONS[compression]}" if COMPRESSIONS[compression] else name
+
+
+def csv_chunks(columns: list[str], batches):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield out.getvalue().encode()
+        out.seek(0)
+        out.truncate()
+    if out.tell():
+        yield out.getvalue().encode()
+
+
+def ndjson_chunks(columns: list[str], batches):
+    """Jeden obiekt JSON na wiersz (w przeciwieństwie do /run/stream tu z nazwami kolumn)."""
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in batch
+        ).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Plik, do którego pisze ParquetWriter; zapisane bajty odbieramy przez drain()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_chunks(columns: list[str], batches, types: list | None = None):
+    """types: typy Arrow kolumn z opisu kursora (encoding.arrow_types), None gdzie nieznane."""
+    types = types or [None] * len(columns)
+    sink = _ChunkSink()
+    writer = None
+    pending = []
+    try:
+        for batch in batches:
+            pending.extend(batch)
+            if len(pending) < PARQUET_ROW_GROUP:
+                continue
+            writer = _write_row_group(writer, sink, columns, types, pending)
+            pending = []
+            yield sink.drain()
+        if pending or writer is None:
+            writer = _write_row_group(writer, sink, columns, types, pending)
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def _write_row_group(writer, sink, columns: list[str], types: list, rows: list):
+    if writer is None:
+        table = _first_row_group(columns, types, rows)
+        writer = encoding.pq.ParquetWriter(sink, table.schema)
+    else:
+        # Kolejne grupy dostają typy ze schematu pliku, a nie zgadnięte ze swoich wierszy
+        table = encoding.to_arrow_table(columns, rows, writer.schema.types)
+    writer.write_table(table)
+    return writer
+
+
+def _first_row_group(columns: list[str], types: list, rows: list):
+    """
+    Pierwsza grupa ustala schemat pliku: typy z kursora, a gdzie ich nie ma (albo wiersze do nich
+    nie pasują) - zgadnięte z danych. Błąd jest tu jeszcze przed wysłaniem pierwszego bajtu.
+    """
+    pa = encoding.pa
+    arrays = []
+    for values, declared in zip(encoding.to_columns(columns, rows), types):
+        array = None
+        if declared is not None:
+            try:
+                array = encoding.arrow_column(values, declared)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+        if array is None:
+            array = encoding.arrow_column(values)
+        if pa.types.is_null(array.type):
+            # Same NULL-e: typ null nie przyjąłby wartości z dalszych grup
+            array = encoding.arrow_column(values, pa.string())
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, names=list(columns))
+
+
+def compress_chunks(chunks, compression: str):
+    if compression == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    elif compression == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    else:
+        yield from chunks
+        return
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(columns: list[str], batches, fmt: str, compression: str, types: list | None = None):
+    """
+    Kolejne kawałki pliku eksportu. Wiersze i bajty trafiają do metryk,
+    a na koniec przepustowość całego eksportu (wiersze/s). types (typy Arrow kolumn)
+    używa tylko Parquet.
+    """
+    start = time.perf_counter()
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for batch in batches:
+            rows += len(batch)
+            yield batch
+
+    if fmt == "parquet":
+        chunks = parquet_chunks(columns, counted(), types)
+    else:
+        chunks = {"csv": csv_chunks, "ndjson": ndjson_chunks}[fmt](columns, counted())
+    for chunk in compress_chunks(chunks, compression):
+        if chunk:
+            export_bytes.inc(fmt, amount=len(chunk))
+            yield chunk
+
+    elapsed = time.perf_counter() - start
+    export_rows.inc(fmt, amount=rows)
+    if elapsed > 0:
+        export_throughput.observe(rows / elapsed, fmt)
@@ -0,0 +1,235 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+import models
+
+# Historia zapytań w bazie metadanych: stronicowanie keyset, wyszukiwanie i archiwizacja starych wpisów
+
+
+def encode_cursor(entry) -> str:
+    """Kursor "created_at,id" wpisu - następna strona to wpisy starsze od niego."""
+    return f"{entry.created_at.isoformat()},{entry.id}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, entry_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except ValueError:
+        raise ValueError("Nieprawidłowy kursor, oczekiwano <created_at>,<id>")
+
+
+def search_condition(dialect: str, q: str):
+    """Postgres: tsvector z indeksem GIN (ix_sql_history_fts), inne bazy: zwykłe ILIKE."""
+    history = models.SQLHistory
+    if dialect == "postgresql":
+        document = func.to_tsvector(
+            "simple", func.coalesce(history.question, "") + " " + func.coalesce(history.generated_sql, "")
+        )
+        return document.bool_op("@@")(func.plainto_tsquery("simple", q))
+    pattern = f"%{q}%"
+    return or_(history.question.ilike(pattern), history.generated_sql.ilike(pattern))
+
+
+async def list_history(session: AsyncSession, project_id: int, limit: int,
+                       before: tuple[datetime, int] | None = None, q: str | None = None):
+    """
+    Strona historii: do limit wpisów starszych niż before, od najnowszych.
+    Zwraca (wpisy rosnąco po czasie, kursor następnej strony albo None).
+    """
+    history = models.SQLHistory
+    query = select(history).where(history.project_id == project_id)
+    if before is not None:
+        query = query.where(tuple_(history.created_at, history.id) < tuple_(*before))
+    if q:
+        query = query.where(search_condition(session.bind.dialect.name, q))
+    query = query.order_by(history.created_at.desc(), history.id.desc()).limit(limit + 1)
+
+    entries = (await session.execute(query)).scalars().all()
+    next_cursor = encode_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return list(reversed(entries[:limit])), next_cursor
+
+
+async def archive_old_entries(eng: AsyncEngine, retention_days: int, batch: int) -> int:
+    """Przenosi wpisy starsze niż retention_days do sql_history_archive, paczkami po batch."""
+    history = models.SQLHistory
+    archive = models.SQLHistoryArchive
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    columns = ["id", "project_id", "question", "generated_sql", "created_at", "schema_fingerprint", "question_key"]
+    moved = 0
+    while True:
+        # Każda paczka w osobnej transakcji, żeby nie blokować tabeli na długo
+        async with AsyncSession(eng) as session:
+            ids = (await session.execute(
+                select(history.id).where(history.created_at < cutoff).order_by(history.id).limit(batch)
+            )).scalars().all()
+            if not ids:
+                return moved
+            await session.execute(insert(archive).from_select(
+                columns,
+                select(*(getattr(history, name) for name in columns)).where(history.id.in_(ids))
+            ))
+            await session.execute(delete(history).where(history.id.in_(ids)))
+            await session.commit()
+        moved += len(ids)
+
+
+class TelemetryWriter:
+    """
+    Bufor telemetrii historii (models.SQLHistoryStats). record() tylko dokłada wiersz do listy,
+    a zadanie w tle zapisuje bufor jednym INSERT-em co flush_interval sekund albo po batch wierszach.
+    """
+
+    def __init__(self, flush_interval: float = 2, batch: int = 200):
+        self.flush_interval = flush_interval
+        self.batch = batch
+        self._buffer: list[dict] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._engine: AsyncEngine | None = None
+
+    def start(self, eng: AsyncEngine, flush_interval: float, batch: int):
+        self._engine = eng
+        self.flush_interval = flush_interval
+        self.batch = batch
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # To, co zostało w buforze, zapisujemy przed zamknięciem silnika
+        await self.flush()
+
+    def record(self, history_id: int | None, project_id: int, kind: str, **values):
+        if history_id is None or self._engine is None:
+            return
+        self._buffer.append({
+            "history_id": history_id, "project_id": project_id, "kind": kind,
+            "created_at": datetime.utcnow(), **values
+        })
+        if len(self._buffer) >= self.batch:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        rows, self._buffer = self._buffer, []
+        if not rows or self._engine is None:
+            return 0
+        async with AsyncSession(self._engine) as session:
+            # historyId z /run przychodzi od klienta - pomijamy wpisy, których (już) nie ma
+            ids = {row["history_id"] for row in rows}
+            existing = set((await session.execute(
+                select(models.SQLHistory.id).where(models.SQLHistory.id.in_(ids))
+            )).scalars().all())
+            rows = [row for row in rows if row["history_id"] in existing]
+            if rows:
+                await session.execute(insert(models.SQLHistoryStats), rows)
+                await session.commit()
+        return len(rows)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Telemetria nie może zatrzymać aplikacji; wiersze z nieudanej paczki przepadają
+                pass
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None}
+    values = sorted(values)
+
+    def at(fraction: float) -> float:
+        # Interpolacja liniowa jak percentile_cont w Postgresie
+        position = (len(values) - 1) * fraction
+        low = int(position)
+        high = min(low + 1, len(values) - 1)
+        return round(values[low] + (values[high] - values[low]) * (position - low), 2)
+
+    return {"p50": at(0.5), "p95": at(0.95)}
+
+
+async def _latency(session: AsyncSession, project_id: int, since: datetime, kind: str, column) -> dict:
+    stats = models.SQLHistoryStats
+    where = (stats.project_id == project_id, stats.kind == kind, stats.created_at >= since, column.isnot(None))
+    if session.bind.dialect.name == "postgresql":
+        p50, p95, count = (await session.execute(
+            select(
+                func.percentile_cont(0.5).within_group(column),
+                func.percentile_cont(0.95).within_group(column),
+                func.count(),
+            ).where(*where)
+        )).one()
+        return {
+            "count": count,
+            "p50": round(p50, 2) if p50 is not None else None,
+            "p95": round(p95, 2) if p95 is not None else None,
+        }
+    values = (await session.execute(select(column).where(*where))).scalars().all()
+    return {"count": len(values), **_percentiles(values)}
+
+
+async def project_stats(session: AsyncSession, project_id: int, days: int, slowest: int = 10) -> dict:
+    """p50/p95 czasu LLM i wykonania, tokeny, błędy według klasy i najwolniejsze wygenerowane zapytania."""
+    stats = models.SQLHistoryStats
+    history = models.SQLHistory
+    since = datetime.utcnow() - timedelta(days=days)
+
+    generations, cached, prompt_tokens, completion_tokens = (await session.execute(
+        select(
+            func.count(),
+            func.count().filter(stats.cached.is_(True)),
+            func.coalesce(func.sum(stats.prompt_tokens), 0),
+            func.coalesce(func.sum(stats.completion_tokens), 0),
+        ).where(stats.project_id == project_id, stats.kind == "generate", stats.created_at >= since)
+    )).one()
+
+    errors = (await session.execute(
+        select(stats.error_class, func.count())
+        .where(stats.project_id == project_id, stats.kind == "execute",
+               stats.created_at >= since, stats.error_class.isnot(None))
+        .group_by(stats.error_class)
+        .order_by(func.count().desc())
+    )).all()
+
+    slow = (await session.execute(
+        select(history.id, history.question, history.generated_sql, stats.exec_ms, stats.row_count, stats.created_at)
+        .join(history, history.id == stats.history_id)
+        .where(stats.project_id == project_id, stats.kind == "execute",
+               stats.created_at >= since, stats.exec_ms.isnot(None), stats.error_class.is_(None))
+        .order_by(stats.exec_ms.desc())
+        .limit(slowest)
+    )).all()
+
+    return {
+        "project_id": project_id,
+        "days": days,
+        "llm_ms": await _latency(session, project_id, since, "generate", stats.llm_ms),
+        "exec_ms": await _latency(session, project_id, since, "execute", stats.exec_ms),
+        "generations": generations,
+        "cached_generations": cached,
+        "tokens": {"prompt": prompt_tokens, "completion": completion_tokens},
+        "errors": {error_class: count for error_class, count in errors},
+        "slowest_queries": [
+            {
+                "history_id": entry_id,
+                "question": question,
+                "sql": sql,
+                "exec_ms": exec_ms,
+                "row_count": row_count,
+                "executed_at": executed_at,
+            }
+            for entry_id, question, sql, exec_ms, row_count, executed_at in slow
+        ],
+    }
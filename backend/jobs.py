@@ -0,0 +1,198 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Zadania w tle (długie zapytania, importy). Wyniki są zapisywane na dysk w paczkach
+# po chunk_rows wierszy: meta.json z kolumnami + part-00000.json.gz z listą wierszy (bez nazw kolumn).
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, project_id: int, kind: str, spool_dir: str):
+        self.id = uuid.uuid4().hex
+        self.project_id = project_id
+        self.kind = kind
+        self.status = "queued" # queued, running, done, failed, cancelled
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.columns: list[str] = []
+        self.rows = 0 # wiersze zapisane / przetworzone do tej pory
+        self.error = None
+        self.result = None # dodatkowe podsumowanie zadania (np. statystyki importu)
+        self.cancelled = False
+        self.on_cancel = None
+        self.spool_dir = os.path.join(spool_dir, self.id)
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0
+        return {
+            "job_id": self.id,
+            "project_id": self.project_id,
+            "kind": self.kind,
+            "status": self.status,
+            "columns": self.columns,
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed else None,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class SpoolWriter:
+    """Zapisuje wiersze zadania na dysk paczkami po chunk_rows."""
+
+    def __init__(self, job: Job, chunk_rows: int):
+        self.job = job
+        self.chunk_rows = chunk_rows
+        self._buffer = []
+        self._parts = 0
+        os.makedirs(job.spool_dir, exist_ok=True)
+
+    def set_columns(self, columns: list[str]):
+        self.job.columns = columns
+
+    def write(self, rows):
+        for row in rows:
+            self._buffer.append(list(row))
+            if len(self._buffer) >= self.chunk_rows:
+                self._flush()
+
+    def close(self):
+        if self._buffer:
+            self._flush()
+        with open(os.path.join(self.job.spool_dir, "meta.json"), "w") as f:
+            json.dump({"columns": self.job.columns, "rows": self.job.rows, "chunk_rows": self.chunk_rows}, f)
+
+    def _flush(self):
+        path = os.path.join(self.job.spool_dir, f"part-{self._parts:05d}.json.gz")
+        with gzip.open(path, "wt", compresslevel=1) as f:
+            json.dump(self._buffer, f, default=str)
+        self.job.rows += len(self._buffer)
+        self._parts += 1
+        self._buffer = []
+
+
+class JobManager:
+    def __init__(self, spool_dir: str = "/tmp/sqlhelper-jobs", workers: int = 4, ttl: float = 3600, chunk_rows: int = 10000):
+        self.spool_dir = spool_dir
+        self.ttl = ttl
+        self.chunk_rows = chunk_rows
+        self._workers = workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, spool_dir: str, workers: int, ttl: float):
+        self.spool_dir = spool_dir
+        self._workers = workers
+        self.ttl = ttl
+
+    def start(self):
+        # Wyniki z poprzedniego uruchomienia nie mają już właściciela
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="job")
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancelled = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, project_id: int, kind: str, work, on_cancel=None) -> Job:
+        """Uruchamia work(job, writer) w puli wątków. on_cancel(job) jest wołane przy anulowaniu."""
+        job = Job(project_id, kind, self.spool_dir)
+        job.on_cancel = on_cancel
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancelled = True
+        if job.status == "running" and job.on_cancel:
+            job.on_cancel(job)
+        elif job.status == "queued":
+            job.status = "cancelled"
+        return job
+
+    def remove(self, job_id: str):
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.cancelled = True
+            shutil.rmtree(job.spool_dir, ignore_errors=True)
+
+    def read_rows(self, job: Job, offset: int, limit: int) -> list[list]:
+        """Czyta wiersze [offset, offset+limit) ze zrzuconych paczek, bez ponownego wykonania zapytania."""
+        rows = []
+        part = offset // self.chunk_rows
+        skip = offset % self.chunk_rows
+        while len(rows) < limit:
+            path = os.path.join(job.spool_dir, f"part-{part:05d}.json.gz")
+            if not os.path.exists(path):
+                break
+            with gzip.open(path, "rt") as f:
+                chunk = json.load(f)
+            rows.extend(chunk[skip:skip + limit - len(rows)])
+            part += 1
+            skip = 0
+        return rows
+
+    def cleanup(self):
+        """Usuwa zakończone zadania starsze niż ttl (razem z plikami)."""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and now - job.finished_at > self.ttl
+            ]
+        for job_id in expired:
+            self.remove(job_id)
+        return len(expired)
+
+    def _run(self, job: Job, work):
+        if job.cancelled:
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        writer = SpoolWriter(job, self.chunk_rows)
+        try:
+            work(job, writer)
+            writer.close()
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "cancelled" if job.cancelled else "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
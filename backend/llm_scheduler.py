@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import time
+
+import metrics
+from client import Client
+
+# Kolejka wywołań LLM przed Client: identyczne prompty w locie generowane są raz (single-flight),
+# równocześnie działa najwyżej `parallel` generacji (tyle slotów ma Ollama), a czekający
+# dostają slot według priorytetu - interaktywne /ask przed pracą w tle.
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+llm_queue_wait = metrics.register(metrics.Histogram(
+    "sqlhelper_llm_queue_wait_seconds", "Czas oczekiwania na wolny slot LLM.", ("priority",)
+))
+llm_coalesced = metrics.register(metrics.Counter(
+    "sqlhelper_llm_coalesced_total", "Wywołania LLM dołączone do identycznej generacji w locie."
+))
+
+
+def prompt_key(messages: list) -> str:
+    return hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _Flight:
+    """Jedna generacja w locie: zadanie wołające LLM i liczba żądań czekających na jej wynik."""
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.slot: asyncio.Future | None = None # czekanie w kolejce na slot
+        self.task: asyncio.Task | None = None
+        self.waiters = 0
+
+
+class LLMScheduler:
+    def __init__(self, client: Client, parallel: int = 1):
+        self.client = client
+        self.parallel = max(1, parallel)
+        self._active = 0
+        self._waiting = [] # kopiec (priorytet, kolejność, future slotu)
+        self._order = itertools.count()
+        self._inflight: dict[str, _Flight] = {}
+
+    async def achat(self, messages, priority: int = INTERACTIVE):
+        """Jak Client.achat, ale przez kolejkę; ten sam prompt w locie czeka na tę samą odpowiedź."""
+        key = prompt_key(messages)
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(priority)
+            # Zadanie kopiuje kontekst lidera, więc tokeny trafiają do jego telemetrii
+            flight.task = asyncio.create_task(self._generate(key, flight, messages))
+            self._inflight[key] = flight
+        else:
+            llm_coalesced.inc()
+            self._promote(flight, priority)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            # Nikt już nie czeka (np. wszyscy klienci się rozłączyli) - nie generujemy na darmo
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    async def achat_stream(self, messages, priority: int = INTERACTIVE):
+        """
+        Jak Client.achat_stream, ale dopiero po dostaniu slotu. Strumieni nie łączymy -
+        tokeny idą do jednego odbiorcy.
+        """
+        flight = _Flight(priority)
+        await self._acquire(flight)
+        try:
+            async for token in self.client.achat_stream(messages):
+                yield token
+        finally:
+            self._release()
+
+    async def _generate(self, key: str, flight: _Flight, messages):
+        try:
+            await self._acquire(flight)
+            try:
+                return await self.client.achat(messages)
+            finally:
+                self._release()
+        finally:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+
+    async def _acquire(self, flight: _Flight):
+        start = time.perf_counter()
+        if self._active < self.parallel and not self._waiting:
+            self._active += 1
+        else:
+            flight.slot = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiting, (flight.priority, next(self._order), flight.slot))
+            try:
+                await flight.slot
+            except asyncio.CancelledError:
+                # Slot mógł zostać przekazany tuż przed anulowaniem - oddajemy go dalej
+                if flight.slot.done() and not flight.slot.cancelled():
+                    self._release()
+                raise
+        llm_queue_wait.observe(time.perf_counter() - start, PRIORITY_NAMES[flight.priority])
+
+    def _release(self):
+        """Przekazuje slot najpilniejszemu czekającemu albo go zwalnia."""
+        while self._waiting:
+            _, _, slot = heapq.heappop(self._waiting)
+            if not slot.done():
+                slot.set_result(None)
+                return
+        self._active -= 1
+
+    def _promote(self, flight: _Flight, priority: int):
+        """Interaktywne żądanie dołączające do generacji w tle podnosi jej miejsce w kolejce."""
+        if priority >= flight.priority or flight.slot is None or flight.slot.done():
+            return
+        flight.priority = priority
+        # Stary wpis zostaje w kopcu, ale _release pominie go, bo future będzie już rozstrzygnięty
+        heapq.heappush(self._waiting, (priority, next(self._order), flight.slot))
+
+    def queue_depth(self) -> dict:
+        """{(priorytet,): liczba czekających} dla metryki; podbite wpisy liczone raz."""
+        depth = {(name,): 0 for name in PRIORITY_NAMES.values()}
+        seen = set()
+        for priority, _, slot in sorted(self._waiting, key=lambda entry: entry[:2]):
+            if not slot.done() and id(slot) not in seen:
+                seen.add(id(slot))
+                depth[(PRIORITY_NAMES[priority],)] += 1
+        return depth
+
+    def stats(self) -> dict:
+        return {
+            "parallel": self.parallel,
+            "active": self._active,
+            "in_flight_prompts": len(self._inflight),
+            "queued": {name: count for (name,), count in self.queue_depth().items()},
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -1,35 +1,140 @@
+import asyncio
 import base64
-from fastapi.responses import Response
-from fastapi import FastAPI, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import create_engine, Engine
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 import services  # Tutaj trzymamy logikę z poprzedniej rozmowy (Ollama, Connection Factory)
+import database
 import models
 import schemas
 from schemas import ConnectionConfig
 from config import Settings
 from typing import List
 from client import Client
+import llm_scheduler
+import metrics
+import sql_cache
+from registry import pool_stats
+import encoding
+import bulk_import
+import export
+import history as history_store
+import preflight
+from execution import QueueFull
+from result_cache import ResultCache
 
 settings = Settings()
-app = FastAPI()
+# Jeden klient na proces - połączenia keep-alive do Ollamy są współdzielone,
+# a wywołania przechodzą przez wspólną kolejkę (priorytety, limit równoległych generacji)
+ollama_client = llm_scheduler.LLMScheduler(Client(
+    url=settings.ollama_url,
+    model=settings.ollama_model,
+    login=settings.ollama_user,
+    password=settings.ollama_pass,
+    connect_timeout=settings.ollama_connect_timeout,
+    read_timeout=settings.ollama_read_timeout,
+    retries=settings.ollama_retries,
+    pool_size=settings.ollama_pool_size,
+), settings.ollama_parallel)
 
-# Dependency do wewnętrznej bazy
-def get_engine():
-    engine = create_engine(f"postgresql://{settings.db_user}:{settings.db_pass}@{settings.db_host}/{settings.db_name}")
-    # Tworzymy tabelę projektów przy starcie
-    models.Base.metadata.create_all(bind=engine)
-    try:
-        yield engine
-    finally:
-        engine.dispose()
 
-def get_client():
-    client = Client(url=settings.ollama_url, model=settings.ollama_model, login=settings.ollama_user, password=settings.ollama_pass)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jeden silnik na proces: pula połączeń i create_all tylko przy starcie
+    await database.init_engine(settings)
+    services.configure_target_engines(settings)
+    services.job_manager.start()
+    telemetry.start(database.get_metadata_engine(), settings.telemetry_flush_interval, settings.telemetry_batch)
+    cleanup = asyncio.create_task(cleanup_jobs())
+    archive = asyncio.create_task(archive_history()) if settings.history_retention_days > 0 else None
     try:
-        yield client
+        yield
     finally:
-        client = None
+        cleanup.cancel()
+        if archive:
+            archive.cancel()
+        services.job_manager.shutdown()
+        await telemetry.stop()
+        await ollama_client.aclose()
+        services.engine_registry.dispose_all()
+        await database.dispose_engine()
+
+
+async def cleanup_jobs():
+    """Co minutę usuwa wyniki zadań starszych niż JOBS_TTL."""
+    while True:
+        await asyncio.sleep(60)
+        await run_in_threadpool(services.job_manager.cleanup)
+
+
+async def archive_history():
+    """Co HISTORY_ARCHIVE_INTERVAL przenosi wpisy starsze niż HISTORY_RETENTION_DAYS do archiwum."""
+    while True:
+        await asyncio.sleep(settings.history_archive_interval)
+        try:
+            await history_store.archive_old_entries(
+                database.get_metadata_engine(), settings.history_retention_days, settings.history_archive_batch
+            )
+        except Exception:
+            # Następny przebieg spróbuje ponownie
+            pass
+
+
+app = FastAPI(lifespan=lifespan)
+# Czasy LLM/wykonania i tokeny per wpis historii, zapisywane paczkami poza ścieżką żądania
+telemetry = history_store.TelemetryWriter()
+
+
+@app.middleware("http")
+async def measure_request(request: Request, call_next):
+    """Czas całego żądania do /metrics i opcjonalny nagłówek Server-Timing z czasami etapów."""
+    timings = metrics.start_request_timings()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    metrics.request_duration.observe(
+        elapsed, request.method, route.path if route else "unmatched", response.status_code
+    )
+    if settings.server_timing:
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings + [("total", elapsed)])
+    return response
+
+
+def _pool_gauges() -> dict:
+    values = {}
+    all_pools = {"metadata": pool_stats(database.get_metadata_engine().sync_engine)}
+    for project_id, stats in services.engine_registry.all_stats().items():
+        all_pools[f"project-{project_id}"] = stats
+    for name, stats in all_pools.items():
+        for field in ("checked_out", "idle", "overflow"):
+            if field in stats:
+                values[(name, field)] = stats[field]
+    return values
+
+
+metrics.register(metrics.Gauge(
+    "sqlhelper_pool_connections", "Połączenia w pulach (metadane i bazy projektów).", ("pool", "state"), _pool_gauges
+))
+metrics.register(metrics.Gauge(
+    "sqlhelper_llm_queue_depth", "Wywołania LLM czekające na slot.", ("priority",), ollama_client.queue_depth
+))
+
+# Dependency do wewnętrznej bazy (async, żeby nie zajmować wątków z puli)
+async def get_engine():
+    yield database.get_metadata_engine()
+
+async def get_client():
+    yield ollama_client
 
 
 # ---------------------------------------------------------
@@ -37,13 +142,13 @@ def get_client():
 # ---------------------------------------------------------
 
 @app.post("/auth/register", status_code=status.HTTP_201_CREATED)
-def register(user_data: schemas.RegisterRequest, eng: Engine = Depends(get_engine)):
-    with Session(eng) as session:
+async def register(user_data: schemas.RegisterRequest, eng: AsyncEngine = Depends(get_engine)):
+    async with AsyncSession(eng, expire_on_commit=False) as session:
         # 1. Sprawdź czy użytkownik lub email już istnieje
-        existing_user = session.query(models.User).filter(
+        existing_user = (await session.execute(select(models.User).where(
             (models.User.email == user_data.email) | 
             (models.User.username == user_data.username)
-        ).first()
+        ))).scalars().first()
         
         if existing_user:
             raise HTTPException(
@@ -59,14 +164,16 @@ def register(user_data: schemas.RegisterRequest, eng: Engine = Depends(get_engin
         )
         
         session.add(new_user)
-        session.commit()
+        await session.commit()
         return {"message": "Rejestracja udana"}
 
 @app.post("/auth/login", response_model=schemas.UserResponse)
-def login(creds: schemas.LoginRequest, eng: Engine = Depends(get_engine)):
-    with Session(eng) as session:
+async def login(creds: schemas.LoginRequest, eng: AsyncEngine = Depends(get_engine)):
+    async with AsyncSession(eng, expire_on_commit=False) as session:
         # Szukamy po username (bo tak loguje się Twój LoginView)
-        user = session.query(models.User).filter(models.User.username == creds.username).first()
+        user = (await session.execute(
+            select(models.User).where(models.User.username == creds.username)
+        )).scalars().first()
 
         if not user or user.password != creds.password:
             raise HTTPException(
@@ -77,9 +184,9 @@ def login(creds: schemas.LoginRequest, eng: Engine = Depends(get_engine)):
         return user
 
 @app.post("/auth/change-password")
-def change_password(data: schemas.ChangePasswordRequest, eng: Engine = Depends(get_engine)):
-    with Session(eng) as session:
-        user = session.query(models.User).filter(models.User.id == data.user_id).first()
+async def change_password(data: schemas.ChangePasswordRequest, eng: AsyncEngine = Depends(get_engine)):
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        user = await session.get(models.User, data.user_id)
 
         if not user:
             raise HTTPException(status_code=404, detail="Użytkownik nie znaleziony")
@@ -88,7 +195,7 @@ def change_password(data: schemas.ChangePasswordRequest, eng: Engine = Depends(g
             raise HTTPException(status_code=400, detail="Stare hasło jest nieprawidłowe")
 
         user.password = data.new_password
-        session.commit()
+        await session.commit()
         
         return {"message": "Hasło zostało zmienione"}
     
@@ -96,13 +203,25 @@ def change_password(data: schemas.ChangePasswordRequest, eng: Engine = Depends(g
 # 1. Obsługa ProjectsView.vue (Lista projektów)
 # ---------------------------------------------------------
 
+def conditional_json(request: Request, body: bytes, tag: str) -> Response:
+    """Odpowiedź JSON z ETagiem; 304 bez body, gdy klient ma już tę wersję (If-None-Match)."""
+    # no-cache: przeglądarka trzyma odpowiedź, ale przed użyciem pyta serwer z If-None-Match
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if encoding.etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
 @app.get("/projects/{id}", response_model=List[schemas.ProjectResponse])
-def get_projects(id: int, eng: Engine = Depends(get_engine)):
+async def get_projects(id: int, request: Request, eng: AsyncEngine = Depends(get_engine)):
     # Mapujemy nazwy kolumn z DB na nazwy pól z Vue (db_host -> dbHost)
-    with Session(eng) as session:
-        projects = session.query(models.User).filter(models.User.id == id).first().projects
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        # Jedno zapytanie po projekty właściciela, bez wczytywania samego użytkownika
+        projects = (await session.execute(
+            select(models.Project).where(models.Project.owner_id == id).order_by(models.Project.id)
+        )).scalars().all()
     # Pydantic zrobi mapowanie jeśli skonfigurujemy aliasy, ale ręcznie jest czytelniej:
-    return [
+    body = json.dumps(jsonable_encoder([
         {
             "id": p.id,
             "name": p.name,
@@ -113,28 +232,35 @@ def get_projects(id: int, eng: Engine = Depends(get_engine)):
             "dbName": p.db_name,
             "dbUser": p.user,
             "dbPassword": p.password, # W produkcji nigdy nie zwracaj hasła!
+            "statementTimeoutMs": p.statement_timeout_ms,
+            "resultCacheTtl": p.result_cache_ttl,
+            "preflightMode": p.preflight_mode,
+            "preflightMaxCost": p.preflight_max_cost,
+            "preflightMaxRows": p.preflight_max_rows,
             "status": p.status
         } for p in projects
-    ]
+    ])).encode()
+    return conditional_json(request, body, encoding.etag(body))
 
 # ---------------------------------------------------------
 # 2. Obsługa NewProjectView.vue (Tworzenie)
 # ---------------------------------------------------------
 
 @app.post("/projects/test-connection")
-def test_connection(config: ConnectionConfig):
+async def test_connection(config: ConnectionConfig):
     """Sprawdza czy dane wpisane w kreatorze działają."""
     try:
-        new_engine = services.create_temp_engine(config)
-        with new_engine.connect() as conn:
-            pass # Udało się połączyć
+        # Sterowniki baz klientów są synchroniczne - łączymy się w wątku, żeby nie blokować pętli
+        await run_in_threadpool(services.check_connection, config)
         return {"status": "success", "message": "Połączono pomyślnie!"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/projects/{id}", status_code=201)
-def create_project(id: int, project: schemas.ProjectCreate, eng: Engine = Depends(get_engine)):
-    with Session(eng) as session:
+async def create_project(id: int, project: schemas.ProjectCreate, eng: AsyncEngine = Depends(get_engine)):
+    if not services.target_type_allowed(project.dbType):
+        raise HTTPException(status_code=400, detail="Bazy SQLite są wyłączone (ALLOW_SQLITE_TARGETS)")
+    async with AsyncSession(eng, expire_on_commit=False) as session:
         db_project = models.Project(
             name=project.name,
             description=project.description,
@@ -144,11 +270,16 @@ def create_project(id: int, project: schemas.ProjectCreate, eng: Engine = Depend
             db_name=project.dbName,
             user=project.dbUser,
             password=project.dbPassword,  # Pamiętaj o szyfrowaniu!
+            statement_timeout_ms=project.statementTimeoutMs,
+            result_cache_ttl=project.resultCacheTtl,
+            preflight_mode=project.preflightMode,
+            preflight_max_cost=project.preflightMaxCost,
+            preflight_max_rows=project.preflightMaxRows,
             status="active",
             owner_id=id,
         )
         session.add(db_project)
-        session.commit()
+        await session.commit()
     return
 
 # ---------------------------------------------------------
@@ -156,118 +287,694 @@ def create_project(id: int, project: schemas.ProjectCreate, eng: Engine = Depend
 # ---------------------------------------------------------
 
 @app.get("/projects/{project_id}/schema")
-def get_project_schema_tree(project_id: int, eng: Engine = Depends(get_engine)):
+async def get_project_schema_tree(project_id: int, request: Request, eng: AsyncEngine = Depends(get_engine)):
     """
     Zwraca schemat w formacie JSON wymaganym przez PrimeVue Tree.
     """
-    with Session(eng) as session:
-        project = session.query(models.Project).filter(models.Project.id == project_id).first()
+    # Klient ma już drzewo z aktualnej migawki - 304 bez pytania bazy metadanych
+    # (usunięcie projektu czyści jego migawkę, więc nie odpowiemy 304 dla usuniętego)
+    cached = services.schema_cache.peek(project_id)
+    if cached is not None:
+        for tag in cached.tree_etags():
+            if encoding.etag_matches(request.headers.get("if-none-match"), tag):
+                return Response(status_code=304, headers={"ETag": tag, "Cache-Control": "no-cache"})
+
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        project = await session.get(models.Project, project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
 
     engine = services.get_engine_from_project(project)
-    
-    # Używamy services do pobrania surowych metadanych
-    raw_metadata = services.inspect_schema_structure(engine) 
-    
-    # Transformacja do formatu PrimeVue Tree
-    # key, label, icon, children
-    tree_nodes = []
-    
-    # Zakładamy schemat 'public' dla uproszczenia, można to rozbudować
-    public_node = {
-        "key": "0",
-        "label": "public",
-        "icon": "pi pi-database",
-        "children": []
+    # Drzewo PrimeVue jest budowane i serializowane raz na migawkę schematu
+    snapshot = await run_in_threadpool(services.get_project_schema, project, engine)
+    body, tag = snapshot.tree_body(project.db_type)
+    return conditional_json(request, body, tag)
+
+@app.post("/projects/{project_id}/schema/refresh")
+async def refresh_project_schema(project_id: int, eng: AsyncEngine = Depends(get_engine)):
+    """Wymusza ponowne pobranie schematu bazy projektu."""
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        project = await session.get(models.Project, project_id)
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+    engine = services.get_engine_from_project(project)
+    snapshot, changed = await run_in_threadpool(services.schema_cache.refresh, project.id, engine)
+    return {
+        "fingerprint": snapshot.fingerprint,
+        "changed": changed,
+        "tables": len(snapshot.tables)
     }
-    
-    for idx, (table_name, columns) in enumerate(raw_metadata.items()):
-        table_key = f"0-{idx}"
-        table_node = {
-            "key": table_key,
-            "label": table_name,
-            "icon": "pi pi-table",
-            "children": []
-        }
-        
-        for col_idx, col_def in enumerate(columns):
-            # col_def to np. "id (INTEGER)"
-            col_node = {
-                "key": f"{table_key}-{col_idx}",
-                "label": col_def,
-                "icon": "pi pi-tag",
-                "selectable": False
-            }
-            table_node["children"].append(col_node)
-            
-        public_node["children"].append(table_node)
-        
-    tree_nodes.append(public_node)
-    return {"schema": tree_nodes, "database_type": project.db_type}
 
 @app.post("/projects/{project_id}/ask")
-def ask_assistant(project_id: int, request: schemas.AskRequest, eng: Engine = Depends(get_engine), client = Depends(get_client)):
-    with Session(eng) as session:
-        project = session.query(models.Project).filter(models.Project.id == project_id).first()
+async def ask_assistant(project_id: int, request: schemas.AskRequest, eng: AsyncEngine = Depends(get_engine), client = Depends(get_client)):
+    with metrics.timed("metadata"):
+        async with AsyncSession(eng, expire_on_commit=False) as session:
+            project = await session.get(models.Project, project_id)
+    if not project:
+        raise HTTPException(404, "Project not found")
+
+    engine = services.get_engine_from_project(project)
+
+    # 1. Pobierz schemat tekstowy dla Ollamy (z cache)
+    with metrics.timed("schema"):
+        snapshot = await run_in_threadpool(services.get_project_schema, project, engine)
+    history = request.history if request.history else None
+    # 2. To samo pytanie przy tym samym schemacie - bierzemy SQL z cache zamiast pytać LLM
+    cache_key, generated_sql = await find_cached_sql(eng, project_id, snapshot, request.question, history)
+    cached = generated_sql is not None
+    prompt_stats = None
+    plan = None
+    usage = metrics.start_llm_usage()
+    llm_ms = None
+    if not cached:
+        # Do promptu trafiają tylko tabele związane z pytaniem (duże bazy nie mieszczą się w kontekście)
+        schema_text, prompt_stats = services.select_schema_context(snapshot, request.question)
+        # Wygeneruj SQL (asynchronicznie - czekanie na LLM nie zajmuje wątku ani połączenia)
+        start = time.perf_counter()
+        generated_sql = await services.agenerate_sql_with_ollama(
+            client,
+            request.question,
+            schema_text,
+            project.db_type,
+            history=history
+        )
+        llm_ms = (time.perf_counter() - start) * 1000
+        if preflight_mode(project, request.preflight) != preflight.OFF:
+            generated_sql, plan = await cheaper_sql(
+                client, project, engine, request.question, schema_text, history, generated_sql
+            )
+        services.sql_cache.put(cache_key, generated_sql)
+
+    entry = await save_generated_sql(eng, project_id, snapshot, request.question, history, generated_sql)
+    record_generation(entry, project_id, cached, llm_ms, usage)
+
+    return {
+        "sql": generated_sql,
+        "history_id": entry.id,
+        "cached": cached,
+        "prompt_tokens_saved": prompt_stats["prompt_tokens_saved"] if prompt_stats else None,
+        "preflight": plan
+    }
+
+
+async def find_cached_sql(eng: AsyncEngine, project_id: int, snapshot, question: str, history):
+    """
+    Szuka SQL dla pytania najpierw w LRU w pamięci, potem w sql_history
+    (tylko pytania bez historii rozmowy). Zwraca (klucz cache, SQL albo None).
+    """
+    key = sql_cache.SQLCache.key(project_id, snapshot.fingerprint, question, history)
+    sql = services.sql_cache.get(key)
+    if sql is not None:
+        services.sql_cache.record("memory")
+        return key, sql
+
+    if not history:
+        async with AsyncSession(eng, expire_on_commit=False) as session:
+            sql = (await session.execute(
+                select(models.SQLHistory.generated_sql)
+                .where(
+                    models.SQLHistory.project_id == project_id,
+                    models.SQLHistory.question_key == key[2],
+                    models.SQLHistory.schema_fingerprint == snapshot.fingerprint
+                )
+                .order_by(models.SQLHistory.created_at.desc())
+                .limit(1)
+            )).scalar()
+        if sql is not None:
+            services.sql_cache.put(key, sql)
+            services.sql_cache.record("history")
+            return key, sql
+
+    services.sql_cache.record(None)
+    return key, None
+
+
+async def cheaper_sql(client, project, engine, question: str, schema_text: str, history, sql: str):
+    """
+    Preflight wygenerowanego SQL; gdy plan przekracza progi, LLM dostaje podsumowanie planu
+    i jedną szansę na tańsze zapytanie. Zwraca (SQL, podsumowanie planu zwróconego SQL).
+    """
+    plan = await run_preflight(project, engine, sql)
+    if not plan or not plan["violations"]:
+        return sql, plan
+
+    retry_history = list(history or []) + [
+        {"role": "user", "content": question},
+        {"role": "assistant", "content": sql},
+    ]
+    # Poprawka planu nie może opóźniać pierwszych odpowiedzi innych użytkowników
+    retry_sql = await services.agenerate_sql_with_ollama(
+        client, preflight.feedback(plan, plan["violations"]), schema_text, project.db_type,
+        history=retry_history, priority=llm_scheduler.BACKGROUND
+    )
+    retry_plan = await run_preflight(project, engine, retry_sql)
+    # Bierzemy nowe zapytanie tylko jeśli da się je zaplanować i jest tańsze
+    if retry_plan and (retry_plan["total_cost"] or 0) < (plan["total_cost"] or 0):
+        retry_plan["regenerated"] = True
+        return retry_sql, retry_plan
+    return sql, plan
+
+
+def preflight_mode(project, requested: bool | None) -> str:
+    mode = project.preflight_mode or preflight.OFF
+    if requested is True and mode == preflight.OFF:
+        return preflight.WARN
+    if requested is False and mode == preflight.WARN:
+        return preflight.OFF
+    # Tryb "reject" ustawia właściciel projektu - żądanie nie może go wyłączyć
+    return mode
+
+
+async def run_preflight(project, engine, sql: str) -> dict | None:
+    plan = await run_in_threadpool(services.preflight_query, engine, sql, statement_timeout(project))
+    if plan is not None:
+        max_cost = project.preflight_max_cost if project.preflight_max_cost is not None else settings.preflight_max_cost
+        max_rows = project.preflight_max_rows if project.preflight_max_rows is not None else settings.preflight_max_rows
+        plan["violations"] = preflight.check(plan, max_cost, max_rows)
+    return plan
+
+
+def record_generation(entry, project_id: int, cached: bool, llm_ms: float | None, usage: dict):
+    telemetry.record(
+        entry.id, project_id, "generate", cached=cached,
+        llm_ms=round(llm_ms, 2) if llm_ms is not None else None,
+        prompt_tokens=usage["prompt_tokens"] if not cached else None,
+        completion_tokens=usage["completion_tokens"] if not cached else None,
+    )
+
+
+async def save_generated_sql(eng: AsyncEngine, project_id: int, snapshot, question: str, history, generated_sql: str):
+    with metrics.timed("history"):
+        return await _insert_history(eng, project_id, snapshot, question, history, generated_sql)
+
+
+async def _insert_history(eng: AsyncEngine, project_id: int, snapshot, question: str, history, generated_sql: str):
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        # Tworzymy wpis w historii
+        new_history = models.SQLHistory(
+             project_id=project_id,
+             question=question,
+             generated_sql=generated_sql,
+             schema_fingerprint=snapshot.fingerprint,
+             # Odpowiedź zależna od rozmowy nie może być potem podana dla samego pytania
+             question_key=None if history else sql_cache.question_key(question)
+        )
+
+        session.add(new_history)
+        await session.commit()
+        return new_history
+
+
+@app.post("/projects/{project_id}/ask/stream")
+async def ask_assistant_stream(project_id: int, request: schemas.AskRequest, eng: AsyncEngine = Depends(get_engine), client = Depends(get_client)):
+    """
+    Jak /ask, ale odpowiedź przychodzi jako Server-Sent Events:
+    zdarzenia "token" z kolejnymi fragmentami i na końcu "done" z oczyszczonym SQL.
+    """
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        project = await session.get(models.Project, project_id)
         if not project:
             raise HTTPException(404, "Project not found")
-        
+
     engine = services.get_engine_from_project(project)
-    
-    # 1. Pobierz schemat tekstowy dla Ollamy
-    schema_text = services.get_db_schema(engine)
+    snapshot = await run_in_threadpool(services.get_project_schema, project, engine)
     history = request.history if request.history else None
-    # 2. Wygeneruj SQL
-    generated_sql = services.generate_sql_with_ollama(
-        client,
-        request.question,
-        schema_text, 
-        project.db_type,
-        history=history
-    )
+
+    cache_key, cached_sql = await find_cached_sql(eng, project_id, snapshot, request.question, history)
+
+    async def events():
+        usage = metrics.start_llm_usage()
+        if cached_sql is not None:
+            entry = await save_generated_sql(eng, project_id, snapshot, request.question, history, cached_sql)
+            record_generation(entry, project_id, True, None, usage)
+            yield f"event: done\ndata: {json.dumps({'sql': cached_sql, 'history_id': entry.id, 'cached': True})}\n\n"
+            return
+
+        schema_text, prompt_stats = services.select_schema_context(snapshot, request.question)
+        start = time.perf_counter()
+        parts = []
+        try:
+            async for token in services.astream_sql_with_ollama(
+                client, request.question, schema_text, project.db_type, history=history
+            ):
+                parts.append(token)
+                yield f"event: token\ndata: {json.dumps({'token': token})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+
+        llm_ms = (time.perf_counter() - start) * 1000
+        generated_sql = services.clean_sql("".join(parts))
+        services.sql_cache.put(cache_key, generated_sql)
+        entry = await save_generated_sql(eng, project_id, snapshot, request.question, history, generated_sql)
+        record_generation(entry, project_id, False, llm_ms, usage)
+        yield f"event: done\ndata: {json.dumps({'sql': generated_sql, 'history_id': entry.id, 'cached': False, 'prompt_tokens_saved': prompt_stats['prompt_tokens_saved']})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/projects/{project_id}/run")
+async def run_sql(project_id: int, request: schemas.RunSQLRequest, http_request: Request, eng: AsyncEngine = Depends(get_engine)):
+    # Format odpowiedzi z nagłówka Accept: JSON wierszami (domyślnie), JSON kolumnowy, Arrow IPC, Parquet
+    response_format = encoding.negotiate(http_request.headers.get("accept"))
+    if response_format in (encoding.ARROW, encoding.PARQUET) and not encoding.arrow_available():
+        raise HTTPException(406, detail="Format Arrow/Parquet wymaga zainstalowanego pyarrow")
+
+    with metrics.timed("metadata"):
+        async with AsyncSession(eng, expire_on_commit=False) as session:
+            project = await session.get(models.Project, project_id)
+    if not project:
+        raise HTTPException(404, "Project not found")
+    engine = services.get_engine_from_project(project)
     
-    # Tworzymy wpis w historii
-    new_history = models.SQLHistory(
-         project_id=project_id,
-         question=request.question,
-         generated_sql=generated_sql
+    # Twardy limit z configu, page_size/max_rows mogą go tylko zmniejszyć
+    limit = settings.run_max_rows
+    for requested in (request.page_size, request.max_rows):
+        if requested is not None:
+            limit = min(limit, requested)
+    if limit < 1:
+        raise HTTPException(400, detail="page_size i max_rows muszą być dodatnie")
+
+    offset = request.offset
+    if request.cursor:
+        try:
+            offset = services.decode_page_cursor(request.sql, request.cursor)
+        except ValueError as e:
+            raise HTTPException(400, detail=str(e))
+
+    query_id = request.query_id or uuid.uuid4().hex
+    # Cache wyników: tylko projekty z result_cache_ttl i tylko zapytania tylko do odczytu.
+    # Cache-Control: no-cache wymusza wykonanie (wynik trafia do cache), no-store omija cache całkiem.
+    cache_key = None
+    cache_status = "OFF"
+    if project.result_cache_ttl and services.classify_sql(request.sql) == "read":
+        cache_control = http_request.headers.get("cache-control", "").lower()
+        cache_key = None if "no-store" in cache_control else ResultCache.key(project_id, request.sql, limit, offset)
+        cache_status = "BYPASS"
+        if cache_key and "no-cache" not in cache_control:
+            cached = await run_in_threadpool(services.result_cache.get, cache_key)
+            if cached is not None:
+                columns, results, has_more = cached
+                next_cursor = services.encode_page_cursor(request.sql, offset + len(results)) if has_more else None
+                return encode_result(response_format, query_id, columns, results, has_more, next_cursor, {"X-Cache": "HIT"})
+            cache_status = "MISS"
+
+    # Generacja sprzed wykonania: zapis, który wejdzie w trakcie, unieważni wynik zanim trafi do cache
+    cache_generation = services.result_cache.generation(project_id) if cache_key else None
+    await acquire_run_slot(project_id)
+    start = time.perf_counter()
+    plan = None
+    try:
+        mode = preflight_mode(project, request.preflight)
+        if mode != preflight.OFF:
+            plan = await run_preflight(project, engine, request.sql)
+            if plan and plan["violations"] and mode == preflight.REJECT:
+                raise HTTPException(422, detail={
+                    "message": "Zapytanie odrzucone przez preflight: " + "; ".join(plan["violations"]),
+                    "preflight": plan
+                })
+        columns, results, has_more = await run_in_threadpool(
+            services.execute_query_page, engine, request.sql, limit, offset,
+            statement_timeout(project), query_id, project_id
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_execution(request.historyId, project_id, start, error=e)
+        raise HTTPException(400, detail=f"SQL Error: {str(e)}")
+    finally:
+        services.run_limiter.release(project_id)
+    record_execution(request.historyId, project_id, start, row_count=len(results))
+
+    if cache_key:
+        await run_in_threadpool(
+            services.result_cache.put, cache_key, (columns, results, has_more), project.result_cache_ttl,
+            cache_generation
+        )
+
+    next_cursor = services.encode_page_cursor(request.sql, offset + len(results)) if has_more else None
+    return encode_result(
+        response_format, query_id, columns, results, has_more, next_cursor, {"X-Cache": cache_status},
+        {"preflight": plan} if plan else None
     )
 
-    session.add(new_history)
-    session.commit()
 
-    return {
-        "sql": generated_sql
+def record_execution(history_id: int | None, project_id: int, start: float,
+                     row_count: int | None = None, error: Exception | None = None):
+    # Klasa błędu sterownika (np. UndefinedTable), a nie opakowania SQLAlchemy
+    error_class = type(getattr(error, "orig", None) or error).__name__ if error else None
+    telemetry.record(
+        history_id, project_id, "execute",
+        exec_ms=round((time.perf_counter() - start) * 1000, 2), row_count=row_count, error_class=error_class
+    )
+
+
+def encode_result(response_format: str, query_id: str, columns: list, rows: list, truncated: bool,
+                  next_cursor: str | None, headers: dict | None = None, extra: dict | None = None):
+    """extra to dodatkowe pola odpowiedzi (np. plan z preflight); w formatach binarnych idą w nagłówku X-Extra."""
+    headers = dict(headers or {})
+    extra = extra or {}
+    with metrics.timed("encode"):
+        if response_format == encoding.RECORDS:
+            return JSONResponse(jsonable_encoder({
+                "query_id": query_id,
+                "columns": columns,
+                "data": encoding.to_records(columns, rows),
+                "truncated": truncated,
+                "next_cursor": next_cursor,
+                **extra
+            }), headers=headers)
+        if response_format == encoding.COLUMNAR:
+            body = encoding.columnar_json(
+                columns, rows, query_id=query_id, truncated=truncated, next_cursor=next_cursor, **extra
+            )
+            return Response(body, media_type=encoding.COLUMNAR, headers=headers)
+
+        # Formaty binarne - metadane strony idą w nagłówkach
+        body = encoding.arrow_ipc(columns, rows) if response_format == encoding.ARROW else encoding.parquet(columns, rows)
+        headers.update({"X-Query-Id": query_id, "X-Truncated": str(truncated).lower()})
+        if extra:
+            headers["X-Extra"] = json.dumps(extra, default=str)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return Response(body, media_type=response_format, headers=headers)
+
+
+@app.post("/projects/{project_id}/run/stream")
+async def run_sql_stream(project_id: int, request: schemas.RunSQLRequest, eng: AsyncEngine = Depends(get_engine)):
+    """
+    Jak /run, ale wyniki lecą jako NDJSON: pierwsza linia {"columns": [...]},
+    potem każdy wiersz jako tablica wartości. Serwer nie trzyma całego wyniku w pamięci.
+    """
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        project = await session.get(models.Project, project_id)
+        if not project:
+            raise HTTPException(404, "Project not found")
+    engine = services.get_engine_from_project(project)
+
+    query_id = request.query_id or uuid.uuid4().hex
+    await acquire_run_slot(project_id)
+    try:
+        columns, _, batches = await run_in_threadpool(
+            services.stream_query, engine, request.sql, 1000,
+            statement_timeout(project), query_id, project_id
+        )
+    except Exception as e:
+        services.run_limiter.release(project_id)
+        raise HTTPException(400, detail=f"SQL Error: {str(e)}")
+
+    async def ndjson():
+        try:
+            yield json.dumps({"columns": columns}) + "\n"
+            try:
+                async for batch in iterate_in_threadpool(batches):
+                    # Jedna paczka = jeden chunk odpowiedzi
+                    yield "".join(json.dumps(list(row), default=str) + "\n" for row in batch)
+            except Exception as e:
+                # Nagłówki już poszły, więc błąd zgłaszamy ostatnią linią
+                yield json.dumps({"error": f"SQL Error: {str(e)}"}) + "\n"
+        finally:
+            # Slot zwalniamy dopiero po wysłaniu ostatniego wiersza (albo zerwaniu połączenia)
+            close = getattr(batches, "close", None)
+            if close:
+                # Zamyka kursor i połączenie, gdy klient przerwał pobieranie
+                await run_in_threadpool(close)
+            services.run_limiter.release(project_id)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers={"X-Query-Id": query_id})
+
+
+@app.get("/projects/{project_id}/export")
+async def export_query(project_id: int, sql: str, format: str = "csv", compression: str = "none",
+                       eng: AsyncEngine = Depends(get_engine)):
+    """
+    Eksport wyniku zapytania do pliku (csv, ndjson, parquet; kompresja gzip albo zstd).
+    Wiersze idą kursorem po stronie serwera prosto do pliku, pamięć nie zależy od wielkości wyniku.
+    """
+    if format not in export.FORMATS:
+        raise HTTPException(400, detail=f"Nieznany format, dostępne: {', '.join(export.FORMATS)}")
+    if compression not in export.COMPRESSIONS:
+        raise HTTPException(400, detail=f"Nieznana kompresja, dostępne: {', '.join(export.COMPRESSIONS)}")
+    if format == "parquet" and not encoding.arrow_available():
+        raise HTTPException(400, detail="Eksport do Parquet wymaga zainstalowanego pyarrow")
+    if not export.compression_available(compression):
+        raise HTTPException(400, detail="Kompresja zstd wymaga zainstalowanego zstandard")
+    # GET nie może niczego zmieniać w bazie
+    if services.classify_sql(sql) != "read":
+        raise HTTPException(400, detail="Eksportować można tylko pojedyncze zapytanie SELECT")
+
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        project = await session.get(models.Project, project_id)
+        if not project:
+            raise HTTPException(404, "Project not found")
+    engine = services.get_engine_from_project(project)
+
+    query_id = uuid.uuid4().hex
+    await acquire_run_slot(project_id)
+    try:
+        columns, column_types, batches = await run_in_threadpool(
+            services.stream_query, engine, sql, settings.export_batch_rows,
+            settings.jobs_statement_timeout_ms, query_id, project_id
+        )
+    except Exception as e:
+        services.run_limiter.release(project_id)
+        raise HTTPException(400, detail=f"SQL Error: {str(e)}")
+
+    async def close_export():
+        close = getattr(batches, "close", None)
+        if close:
+            await run_in_threadpool(close)
+        services.run_limiter.release(project_id)
+
+    types = encoding.arrow_types(engine.dialect.name, column_types) if format == "parquet" else None
+    chunks = export.export_chunks(columns, batches, format, compression, types)
+    try:
+        # Pierwszy kawałek (w Parquet cała pierwsza grupa wierszy, która ustala schemat) liczymy
+        # przed wysłaniem nagłówków - błąd daje wtedy 400, a nie ucięty plik
+        first = await run_in_threadpool(next, chunks, b"")
+    except Exception as e:
+        await close_export()
+        raise HTTPException(400, detail=f"Export Error: {str(e)}")
+
+    async def body():
+        try:
+            yield first
+            async for chunk in iterate_in_threadpool(chunks):
+                yield chunk
+        finally:
+            await close_export()
+
+    media_type = export.FORMATS[format][0]
+    headers = {
+        "Content-Disposition": f'attachment; filename="{export.filename(format, compression)}"',
+        "X-Query-Id": query_id,
     }
-        
-       
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
 
 
-@app.post("/projects/{project_id}/run")
-def run_sql(project_id: int, request: schemas.RunSQLRequest, eng: Engine = Depends(get_engine)):
-    with Session(eng) as session:
-        project = session.query(models.Project).filter(models.Project.id == project_id).first()
-        engine = services.get_engine_from_project(project)
-    
+@app.post("/projects/{project_id}/run/script")
+async def run_script(project_id: int, request: schemas.RunScriptRequest, eng: AsyncEngine = Depends(get_engine)):
+    """
+    Wykonuje skrypt wielu instrukcji w jednej transakcji i zwraca wynik każdej z nich.
+    Przy błędzie cała transakcja jest cofana, a odpowiedź 400 podaje numer instrukcji.
+    """
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        project = await session.get(models.Project, project_id)
+        if not project:
+            raise HTTPException(404, "Project not found")
+    engine = services.get_engine_from_project(project)
+
+    max_rows = min(request.max_rows or settings.run_max_rows, settings.run_max_rows)
+    query_id = request.query_id or uuid.uuid4().hex
+    await acquire_run_slot(project_id)
     try:
-        results = services.execute_query(engine, request.sql)
-        # Pobieramy klucze z pierwszego rzędu, jeśli są
-        columns = list(results[0].keys()) if results else []
-        return {
-            "columns": columns,
-            "data": results
-        }
+        results = await run_in_threadpool(
+            services.execute_script, engine, request.sql, max_rows,
+            statement_timeout(project), query_id, project_id
+        )
+    except services.ScriptError as e:
+        raise HTTPException(400, detail=jsonable_encoder({
+            "message": f"SQL Error: {str(e)}",
+            "statement_index": e.index,
+            "results": e.results,
+            "rolled_back": True
+        }))
     except Exception as e:
         raise HTTPException(400, detail=f"SQL Error: {str(e)}")
+    finally:
+        services.run_limiter.release(project_id)
+
+    for entry in results:
+        if "data" in entry:
+            entry["data"] = encoding.to_records(entry["columns"], entry["data"])
+    return {
+        "query_id": query_id,
+        "statements": sum(entry["statements"] for entry in results),
+        "elapsed_ms": round(sum(entry["elapsed_ms"] for entry in results), 2),
+        "results": results
+    }
+
+
+def statement_timeout(project) -> int:
+    return project.statement_timeout_ms or settings.run_statement_timeout_ms
+
+
+async def acquire_run_slot(project_id: int):
+    """Czeka na wolny slot wykonania w projekcie; 429 z pozycją w kolejce gdy kolejka jest pełna."""
+    try:
+        await services.run_limiter.acquire(project_id)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail={"message": str(e), "queue_position": e.position},
+            headers={"Retry-After": "1"}
+        )
+
+
+# ---------------------------------------------------------
+# Zadania w tle (długie zapytania)
+# ---------------------------------------------------------
+
+@app.post("/projects/{project_id}/jobs", status_code=202)
+async def create_job(project_id: int, request: schemas.JobCreate, eng: AsyncEngine = Depends(get_engine)):
+    """Uruchamia zapytanie w tle. Status: GET .../jobs/{job_id}, wyniki: GET .../jobs/{job_id}/results."""
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        project = await session.get(models.Project, project_id)
+        if not project:
+            raise HTTPException(404, "Project not found")
+    engine = services.get_engine_from_project(project)
+
+    job = services.submit_query_job(engine, project_id, request.sql, settings.jobs_statement_timeout_ms)
+    return job.to_dict()
+
+
+@app.post("/projects/{project_id}/import", status_code=202)
+async def import_file(project_id: int, table: str, http_request: Request, format: str | None = None,
+                      filename: str | None = None, delimiter: str = ",", eng: AsyncEngine = Depends(get_engine)):
+    """
+    Import pliku CSV (z nagłówkiem) albo Parquet do tabeli. Plik idzie jako surowe body żądania
+    (Content-Type: text/csv albo application/vnd.apache.parquet). Import działa jako zadanie w tle,
+    postęp: GET .../jobs/{job_id}.
+    """
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        project = await session.get(models.Project, project_id)
+        if not project:
+            raise HTTPException(404, "Project not found")
+    engine = services.get_engine_from_project(project)
+
+    file_format = format or bulk_import.detect_format(http_request.headers.get("content-type"), filename)
+    if file_format not in (bulk_import.CSV, bulk_import.PARQUET):
+        raise HTTPException(415, detail="Obsługiwane formaty: csv, parquet")
+    if file_format == bulk_import.PARQUET and not encoding.arrow_available():
+        raise HTTPException(415, detail="Import Parquet wymaga zainstalowanego pyarrow")
+
+    # Tabela i typy kolumn z cache'owanego schematu
+    snapshot = await run_in_threadpool(services.get_project_schema, project, engine)
+    tables = {name.lower(): name for name in snapshot.tables}
+    if table.lower() not in tables:
+        raise HTTPException(404, detail=f"Tabela {table} nie istnieje")
+    table = tables[table.lower()]
+
+    path = await save_upload(http_request, file_format)
+    try:
+        file_columns = await run_in_threadpool(bulk_import.read_columns, path, file_format, delimiter)
+        known = {name.lower(): name for name, _ in snapshot.tables[table]}
+        unknown = [name for name in file_columns if name.lower() not in known]
+        if not file_columns or unknown:
+            raise HTTPException(400, detail={"message": "Kolumny pliku nie pasują do tabeli", "unknown_columns": unknown})
+        # Do COPY/INSERT idą nazwy ze schematu (nagłówek "Name" i kolumna name w postgresie to nie to samo)
+        columns = [known[name.lower()] for name in file_columns]
+    except HTTPException:
+        os.remove(path)
+        raise
+    except Exception as e:
+        os.remove(path)
+        raise HTTPException(400, detail=f"Nie można odczytać pliku: {str(e)}")
+
+    job = services.submit_import_job(
+        engine, project_id, table, path, file_format, columns, snapshot.tables[table],
+        delimiter, settings.import_batch_rows, settings.jobs_statement_timeout_ms
+    )
+    return job.to_dict()
+
+
+async def save_upload(http_request: Request, file_format: str) -> str:
+    """Zapisuje body żądania na dysk kawałkami (bez trzymania całego pliku w pamięci)."""
+    upload_dir = os.path.join(settings.jobs_spool_dir, "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f"{uuid.uuid4().hex}.{file_format}")
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            async for chunk in http_request.stream():
+                size += len(chunk)
+                if size > settings.import_max_bytes:
+                    raise HTTPException(413, detail="Plik jest za duży")
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def get_job_or_404(project_id: int, job_id: str):
+    job = services.job_manager.get(job_id)
+    if job is None or job.project_id != project_id:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@app.get("/projects/{project_id}/jobs/{job_id}")
+async def get_job(project_id: int, job_id: str):
+    return get_job_or_404(project_id, job_id).to_dict()
+
+
+@app.get("/projects/{project_id}/jobs/{job_id}/results")
+async def get_job_results(project_id: int, job_id: str, offset: int = 0, limit: int = 500):
+    """Strona wyników zadania czytana z plików - zapytanie nie jest wykonywane ponownie."""
+    job = get_job_or_404(project_id, job_id)
+    if job.kind != "query":
+        raise HTTPException(409, detail="Job has no results")
+    if job.status != "done":
+        raise HTTPException(409, detail=f"Job is {job.status}")
+    limit = max(1, min(limit, settings.run_max_rows))
+
+    rows = await run_in_threadpool(services.job_manager.read_rows, job, offset, limit)
+    has_more = offset + len(rows) < job.rows
+    return {
+        "columns": job.columns,
+        "data": [dict(zip(job.columns, row)) for row in rows],
+        "total_rows": job.rows,
+        "truncated": has_more,
+        "next_offset": offset + len(rows) if has_more else None
+    }
+
+
+@app.delete("/projects/{project_id}/jobs/{job_id}")
+async def delete_job(project_id: int, job_id: str):
+    """Anuluje zadanie (także zapytanie w bazie) i usuwa jego wyniki."""
+    get_job_or_404(project_id, job_id)
+    await run_in_threadpool(services.job_manager.cancel, job_id)
+    services.job_manager.remove(job_id)
+    return Response(status_code=200)
+
+
+@app.post("/projects/{project_id}/queries/{query_id}/cancel")
+async def cancel_query(project_id: int, query_id: str):
+    """Anuluje działające zapytanie (pg_cancel_backend / KILL QUERY)."""
+    cancelled = await run_in_threadpool(services.running_queries.cancel, project_id, query_id)
+    if not cancelled:
+        raise HTTPException(404, "Query not running")
+    return {"status": "cancelled", "query_id": query_id}
 
 
 #do testow, sam w sobie jest zbedny
 @app.post("/projects/{project_id}/history")
-def save_history(project_id: int, history: schemas.HistoryCreate, eng: Engine = Depends(get_engine)):
-    with Session(eng) as session:
+async def save_history(project_id: int, history: schemas.HistoryCreate, eng: AsyncEngine = Depends(get_engine)):
+    async with AsyncSession(eng, expire_on_commit=False) as session:
         # Sprawdzamy czy projekt istnieje
-        project = session.query(models.Project).filter(models.Project.id == project_id).first()
+        project = await session.get(models.Project, project_id)
         if not project:
             raise HTTPException(404, "Project not found")
 
@@ -279,30 +986,77 @@ def save_history(project_id: int, history: schemas.HistoryCreate, eng: Engine =
         )
         
         session.add(new_entry)
-        session.commit()
+        await session.commit()
         
         return {"status": "saved", "id": new_entry.id}
 
 
 @app.get("/projects/{project_id}/history", response_model=List[schemas.HistoryResponse])
-def get_project_history(project_id: int, eng: Engine = Depends(get_engine)):
-    with Session(eng) as session:
+async def get_project_history(project_id: int, response: Response, before: str | None = None,
+                              limit: int | None = None, q: str | None = None,
+                              eng: AsyncEngine = Depends(get_engine)):
+    """
+    Ostatnie wpisy historii (rosnąco po czasie). Starsze strony: ?before=<X-Next-Cursor z poprzedniej>,
+    wyszukiwanie w pytaniach i SQL: ?q=.
+    """
+    limit = max(1, min(limit or settings.history_page_size, settings.history_max_page_size))
+    try:
+        cursor = history_store.decode_cursor(before) if before else None
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
+
+    async with AsyncSession(eng, expire_on_commit=False) as session:
 
-        project = session.query(models.Project).filter(models.Project.id == project_id).first()
+        project = await session.get(models.Project, project_id)
         if not project:
             raise HTTPException(404, "Project not found")
 
-        history = session.query(models.SQLHistory)\
-            .filter(models.SQLHistory.project_id == project_id)\
-            .order_by(models.SQLHistory.created_at.asc())\
-            .all()
-            
-        return history
+        history, next_cursor = await history_store.list_history(session, project_id, limit, cursor, q)
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return history
+
+
+@app.get("/projects/{project_id}/stats")
+async def get_project_stats(project_id: int, days: int = 30, eng: AsyncEngine = Depends(get_engine)):
+    """Czasy generowania i wykonania (p50/p95), tokeny, błędy i najwolniejsze zapytania z ostatnich dni."""
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        project = await session.get(models.Project, project_id)
+        if not project:
+            raise HTTPException(404, "Project not found")
+        return await history_store.project_stats(session, project_id, max(1, days))
 
 
 @app.delete("/projects/{project_id}")
-def delete_project(project_id: int, eng: Engine = Depends(get_engine)):
-    with Session(eng) as session:
-        session.query(models.Project).filter(models.Project.id == project_id).delete()
-        session.commit()
-        return Response(status_code=200)
\ No newline at end of file
+async def delete_project(project_id: int, eng: AsyncEngine = Depends(get_engine)):
+    async with AsyncSession(eng, expire_on_commit=False) as session:
+        await session.execute(delete(models.Project).where(models.Project.id == project_id))
+        await session.commit()
+    # Zamykamy pulę do bazy usuniętego projektu
+    await run_in_threadpool(services.forget_project, project_id)
+    return Response(status_code=200)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Metryki w formacie tekstowym Prometheusa."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Liczniki trafień cache wygenerowanych zapytań i wyników /run."""
+    return {"sql": services.sql_cache.stats(), "result": services.result_cache.stats()}
+
+
+@app.get("/llm/stats")
+async def get_llm_stats():
+    """Stan kolejki LLM: zajęte sloty, generacje w locie i czekający według priorytetu."""
+    return ollama_client.stats()
+
+
+@app.get("/projects/{project_id}/pool")
+async def get_project_pool_stats(project_id: int):
+    """Statystyki puli połączeń do bazy projektu (null jeśli silnik nie jest otwarty)."""
+    return {"project_id": project_id, "pool": services.engine_registry.stats(project_id)}
\ No newline at end of file
@@ -0,0 +1,165 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Prosty rejestr metryk w formacie tekstowym Prometheusa (bez dodatkowych zależności)
+
+_DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _labels_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels_text(self.labels, values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = _DEFAULT_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # wartości etykiet -> [liczniki kubełków..., suma, liczba]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            entry = self._values.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, entry in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, entry):
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_labels_text(self.labels, values, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels_text(self.labels, values, le)} {entry[-1]}")
+                lines.append(f"{self.name}_sum{_labels_text(self.labels, values)} {entry[-2]}")
+                lines.append(f"{self.name}_count{_labels_text(self.labels, values)} {entry[-1]}")
+        return lines
+
+
+class Gauge:
+    """Wartości liczone dopiero przy odczycie /metrics: callback zwraca {wartości etykiet: liczba}."""
+
+    def __init__(self, name: str, help: str, labels: tuple, callback):
+        self.name, self.help, self.labels, self.callback = name, help, labels, callback
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for values, value in sorted(self.callback().items()):
+            lines.append(f"{self.name}{_labels_text(self.labels, values)} {value}")
+        return lines
+
+
+_registry = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+request_duration = register(Histogram(
+    "sqlhelper_request_duration_seconds", "Czas obsługi żądania HTTP.", ("method", "route", "status")
+))
+stage_duration = register(Histogram(
+    "sqlhelper_stage_duration_seconds", "Czas etapów obsługi żądania (baza metadanych, schemat, LLM, wykonanie...).", ("stage",)
+))
+llm_tokens = register(Counter(
+    "sqlhelper_llm_tokens_total", "Tokeny przetworzone przez LLM (prompt/completion).", ("kind",)
+))
+llm_generation_seconds = register(Counter(
+    "sqlhelper_llm_generation_seconds_total", "Czas generowania tokenów odpowiedzi według Ollamy (eval_duration)."
+))
+llm_prompt_seconds = register(Counter(
+    "sqlhelper_llm_prompt_seconds_total", "Czas przetwarzania promptu według Ollamy (prompt_eval_duration)."
+))
+cache_requests = register(Counter(
+    "sqlhelper_cache_requests_total", "Odczyty z cache według wyniku.", ("cache", "result")
+))
+
+# Etapy bieżącego żądania do nagłówka Server-Timing (ustawiane przez middleware w main.py)
+_timings: contextvars.ContextVar[list | None] = contextvars.ContextVar("timings", default=None)
+
+
+def start_request_timings() -> list:
+    timings = []
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def timed(stage: str):
+    """Mierzy czas etapu: histogram w /metrics i wpis do Server-Timing bieżącego żądania."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+# Zużycie LLM w bieżącym żądaniu (tokeny do telemetrii historii), ustawiane przez start_llm_usage
+_llm_usage: contextvars.ContextVar[dict | None] = contextvars.ContextVar("llm_usage", default=None)
+
+
+def start_llm_usage() -> dict:
+    usage = {"prompt_tokens": 0, "completion_tokens": 0}
+    _llm_usage.set(usage)
+    return usage
+
+
+def record_llm_response(response_json: dict):
+    """Liczniki tokenów i czasu generacji z pól eval_count/eval_duration odpowiedzi Ollamy."""
+    usage = _llm_usage.get()
+    if usage is not None:
+        usage["prompt_tokens"] += response_json.get("prompt_eval_count") or 0
+        usage["completion_tokens"] += response_json.get("eval_count") or 0
+    if response_json.get("prompt_eval_count"):
+        llm_tokens.inc("prompt", amount=response_json["prompt_eval_count"])
+    if response_json.get("eval_count"):
+        llm_tokens.inc("completion", amount=response_json["eval_count"])
+    # Ollama podaje czasy w nanosekundach
+    if response_json.get("eval_duration"):
+        llm_generation_seconds.inc(amount=response_json["eval_duration"] / 1e9)
+    if response_json.get("prompt_eval_duration"):
+        llm_prompt_seconds.inc(amount=response_json["prompt_eval_duration"] / 1e9)
+
+
+def server_timing_header(timings: list) -> str:
+    return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in timings)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, ForeignKey, Index, Float, Boolean
 from sqlalchemy.orm import  declarative_base, relationship
 from datetime import datetime
 
@@ -20,6 +20,14 @@ class Project(Base):
     password = Column(String) 
     db_name = Column(String)
     status = Column(String, default="active") # active, offline
+    # Limit czasu pojedynczego zapytania na bazie klienta (ms); NULL = domyślny z configu
+    statement_timeout_ms = Column(Integer, nullable=True)
+    # Jak długo (s) trzymać wyniki SELECT-ów z /run w cache; NULL = cache wyłączony
+    result_cache_ttl = Column(Integer, nullable=True)
+    # Preflight EXPLAIN przed /run: off / warn / reject; progi NULL = domyślne z configu
+    preflight_mode = Column(String(16), nullable=True)
+    preflight_max_cost = Column(Float, nullable=True)
+    preflight_max_rows = Column(Integer, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
     # Relationship back to User
     owner = relationship("User", back_populates="projects")
@@ -45,4 +53,51 @@ class SQLHistory(Base):
     project = relationship("Project", back_populates="history")
     question = Column(String)
     generated_sql = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Klucz cache zapytań: fingerprint schematu i skrót znormalizowanego pytania.
+    # question_key jest pusty gdy pytanie padło w trakcie rozmowy (zależy od historii).
+    schema_fingerprint = Column(String(64), nullable=True)
+    question_key = Column(String(40), nullable=True)
+
+    __table_args__ = (
+        Index("ix_sql_history_question_key", "project_id", "question_key"),
+        # Stronicowanie historii projektu od najnowszych (keyset po created_at, id)
+        Index("ix_sql_history_project_created", "project_id", "created_at", "id"),
+    )
+
+
+class SQLHistoryStats(Base):
+    """
+    Telemetria wpisów historii: jeden wiersz na zdarzenie - wygenerowanie SQL (kind="generate")
+    albo jego wykonanie przez /run (kind="execute"). Zapisywana paczkami w tle (history.TelemetryWriter).
+    """
+    __tablename__ = "sql_history_stats"
+    id = Column(Integer, primary_key=True)
+    history_id = Column(Integer, ForeignKey("sql_history.id", ondelete="CASCADE"), index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
+    kind = Column(String(16))
+    cached = Column(Boolean, default=False) # SQL z cache, bez wywołania LLM
+    llm_ms = Column(Float, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    exec_ms = Column(Float, nullable=True)
+    row_count = Column(Integer, nullable=True)
+    error_class = Column(String(128), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_sql_history_stats_project", "project_id", "kind", "created_at"),
+    )
+
+
+class SQLHistoryArchive(Base):
+    """Wpisy historii starsze niż HISTORY_RETENTION_DAYS, przeniesione z sql_history."""
+    __tablename__ = "sql_history_archive"
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), index=True)
+    question = Column(String)
+    generated_sql = Column(Text)
+    created_at = Column(DateTime)
+    schema_fingerprint = Column(String(64), nullable=True)
+    question_key = Column(String(40), nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
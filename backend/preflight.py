@@ -0,0 +1,120 @@
+import json
+
+from sqlalchemy import text
+
+# Preflight przed wykonaniem: EXPLAIN bez ANALYZE (zapytanie nie jest wykonywane),
+# z planu bierzemy szacowany koszt, liczbę wierszy, pełne skany i złączenia bez warunku.
+
+_EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+OFF = "off"
+WARN = "warn"
+REJECT = "reject"
+
+
+def explainable(sql: str) -> bool:
+    body = sql.strip().rstrip(";").strip()
+    first_word = body.split(None, 1)[0].lower() if body else ""
+    return first_word in _EXPLAINABLE and ";" not in body
+
+
+def explain(conn, sql: str) -> dict | None:
+    """Podsumowanie planu zapytania albo None, gdy dialekt nie jest obsługiwany."""
+    dialect = conn.dialect.name
+    body = sql.strip().rstrip(";")
+    if dialect == "postgresql":
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {body}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return summarize_postgres(plan)
+    if dialect == "mysql":
+        plan = conn.execute(text(f"EXPLAIN FORMAT=JSON {body}")).scalar()
+        return summarize_mysql(json.loads(plan))
+    return None
+
+
+def _walk_postgres(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk_postgres(child)
+
+
+def summarize_postgres(plan: list) -> dict:
+    root = plan[0]["Plan"]
+    full_scans = []
+    cartesian = False
+    for node in _walk_postgres(root):
+        if node.get("Node Type") == "Seq Scan":
+            full_scans.append({"table": node.get("Relation Name"), "rows": node.get("Plan Rows")})
+        # Nested Loop bez Join Filter i bez warunku indeksu po wewnętrznej stronie = iloczyn kartezjański
+        if node.get("Node Type") == "Nested Loop" and "Join Filter" not in node:
+            inner = node.get("Plans", [{}])[-1]
+            if not any("Index Cond" in child or "Recheck Cond" in child for child in _walk_postgres(inner)):
+                cartesian = True
+    return {
+        "dialect": "postgresql",
+        "total_cost": root.get("Total Cost"),
+        "estimated_rows": root.get("Plan Rows"),
+        "full_scans": full_scans,
+        "cartesian_join": cartesian,
+        "root": root.get("Node Type"),
+    }
+
+
+def _walk_mysql(node):
+    """Wszystkie obiekty "table" z planu MySQL (zagnieżdżone w nested_loop, subqueries itp.)."""
+    if isinstance(node, dict):
+        if "table_name" in node and "access_type" in node:
+            yield node
+        for value in node.values():
+            yield from _walk_mysql(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk_mysql(value)
+
+
+def summarize_mysql(plan: dict) -> dict:
+    block = plan.get("query_block", {})
+    tables = list(_walk_mysql(block))
+    full_scans = [
+        {"table": table["table_name"], "rows": table.get("rows_examined_per_scan")}
+        for table in tables if table.get("access_type") == "ALL"
+    ]
+    # Pełny skan złączany bez warunku (brak attached_condition) to iloczyn kartezjański
+    cartesian = any(
+        table.get("access_type") == "ALL" and table.get("using_join_buffer") and "attached_condition" not in table
+        for table in tables
+    )
+    cost = block.get("cost_info", {}).get("query_cost")
+    estimated_rows = tables[-1].get("rows_produced_per_join") if tables else None
+    return {
+        "dialect": "mysql",
+        "total_cost": float(cost) if cost is not None else None,
+        "estimated_rows": estimated_rows,
+        "full_scans": full_scans,
+        "cartesian_join": cartesian,
+        "root": "query_block",
+    }
+
+
+def check(summary: dict, max_cost: float | None, max_rows: int | None) -> list[str]:
+    """Lista przekroczonych progów (pusta = zapytanie przechodzi)."""
+    violations = []
+    if max_cost is not None and (summary.get("total_cost") or 0) > max_cost:
+        violations.append(f"Szacowany koszt {summary['total_cost']:.0f} przekracza limit {max_cost:.0f}")
+    if max_rows is not None and (summary.get("estimated_rows") or 0) > max_rows:
+        violations.append(f"Szacowana liczba wierszy {summary['estimated_rows']} przekracza limit {max_rows}")
+    if summary.get("cartesian_join"):
+        violations.append("Złączenie bez warunku (iloczyn kartezjański)")
+    return violations
+
+
+def feedback(summary: dict, violations: list[str]) -> str:
+    """Opis problemu dla LLM, żeby wygenerował tańsze zapytanie."""
+    lines = ["Plan wykonania tego zapytania jest zbyt kosztowny:"]
+    lines.extend(f"- {violation}" for violation in violations)
+    if summary.get("full_scans"):
+        tables = ", ".join(str(scan["table"]) for scan in summary["full_scans"])
+        lines.append(f"- Pełne skany tabel: {tables}")
+    lines.append("Wygeneruj tańsze zapytanie zwracające to samo (warunki złączeń, filtry, LIMIT).")
+    return "\n".join(lines)
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import Engine
+
+
+class EngineRegistry:
+    """
+    Cache silników do baz klientów, kluczowany po id projektu.
+    Każdy projekt ma jeden silnik (i jedną pulę). Najdawniej używane silniki
+    są usuwane po przekroczeniu max_size, a nieużywane dłużej niż ttl sekund
+    są zamykane przy kolejnym dostępie do rejestru.
+    """
+
+    def __init__(self, max_size: int = 32, ttl: float = 900):
+        self.max_size = max_size
+        self.ttl = ttl
+        # project_id -> (fingerprint połączenia, silnik, ostatnie użycie)
+        self._engines: OrderedDict[int, tuple[str, Engine, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_size: int, ttl: float):
+        with self._lock:
+            self.max_size = max_size
+            self.ttl = ttl
+
+    def get(self, project_id: int, fingerprint: str, factory) -> Engine:
+        """
+        Zwraca silnik projektu. Jeśli dane połączenia się zmieniły (inny fingerprint),
+        stary silnik jest zamykany i tworzony jest nowy przez factory().
+        """
+        stale = []
+        with self._lock:
+            now = time.monotonic()
+            stale.extend(self._pop_expired(now))
+
+            entry = self._engines.get(project_id)
+            if entry is not None and entry[0] != fingerprint:
+                stale.append(entry[1])
+                del self._engines[project_id]
+                entry = None
+
+            if entry is None:
+                engine = factory()
+            else:
+                engine = entry[1]
+
+            self._engines[project_id] = (fingerprint, engine, now)
+            self._engines.move_to_end(project_id)
+
+            while len(self._engines) > self.max_size:
+                _, (_, old_engine, _) = self._engines.popitem(last=False)
+                stale.append(old_engine)
+
+        # Zamykamy pule poza lockiem, dispose może chwilę potrwać
+        for old in stale:
+            old.dispose()
+        return engine
+
+    def invalidate(self, project_id: int):
+        """Zamyka silnik projektu (np. po usunięciu projektu)."""
+        with self._lock:
+            entry = self._engines.pop(project_id, None)
+        if entry is not None:
+            entry[1].dispose()
+
+    def dispose_all(self):
+        with self._lock:
+            engines = [engine for _, engine, _ in self._engines.values()]
+            self._engines.clear()
+        for engine in engines:
+            engine.dispose()
+
+    def stats(self, project_id: int) -> dict | None:
+        """Statystyki puli projektu: wypożyczone, bezczynne i overflow."""
+        with self._lock:
+            entry = self._engines.get(project_id)
+        if entry is None:
+            return None
+        return pool_stats(entry[1])
+
+    def all_stats(self) -> dict[int, dict]:
+        with self._lock:
+            engines = {pid: engine for pid, (_, engine, _) in self._engines.items()}
+        return {pid: pool_stats(engine) for pid, engine in engines.items()}
+
+    def _pop_expired(self, now: float) -> list[Engine]:
+        expired = [pid for pid, (_, _, used) in self._engines.items() if now - used > self.ttl]
+        return [self._engines.pop(pid)[1] for pid in expired]
+
+
+def pool_stats(engine: Engine) -> dict:
+    pool = engine.pool
+    # NullPool/StaticPool nie mają tych metod
+    if not hasattr(pool, "checkedout"):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
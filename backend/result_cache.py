@@ -0,0 +1,190 @@
+import hashlib
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+def normalize_sql(sql: str) -> str:
+    """Pojedyncze spacje poza literałami, bez końcowego średnika. Wielkość liter zostaje (literały!)."""
+    parts = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(";").strip())
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part)
+        for i, part in enumerate(parts)
+    )
+
+
+class ResultCache:
+    """
+    LRU wyników zapytań tylko do odczytu: (projekt, znormalizowany SQL, limit, offset) -> strona wyników.
+    Pamięć jest ograniczona w bajtach (rozmiar zapiklowanego wyniku). Wyniki większe niż spill_bytes
+    trzymamy na dysku w spill_dir, a w pamięci tylko ścieżkę.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, spill_bytes: int = 1024 * 1024,
+                 spill_dir: str = "/tmp/sqlhelper-results", max_disk_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        self.spill_dir = spill_dir
+        self.max_disk_bytes = max_disk_bytes
+        # klucz -> (dane albo None, ścieżka albo None, rozmiar, wygasa)
+        self._entries: OrderedDict[tuple, tuple] = OrderedDict()
+        self._memory = 0
+        self._disk = 0
+        self._lock = threading.Lock()
+        # project_id -> numer generacji, podbijany przy każdym unieważnieniu projektu
+        self._generations: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_bytes: int, spill_bytes: int, spill_dir: str, max_disk_bytes: int):
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        self.spill_dir = spill_dir
+        self.max_disk_bytes = max_disk_bytes
+        # Czyścimy dopiero docelowy katalog - mogą w nim leżeć pliki po poprzednim uruchomieniu
+        self.clear()
+
+    @staticmethod
+    def key(project_id: int, sql: str, limit: int, offset: int) -> tuple:
+        digest = hashlib.sha1(normalize_sql(sql).encode()).hexdigest()
+        return (project_id, digest, limit, offset)
+
+    def get(self, key: tuple):
+        """(kolumny, wiersze, czy_jest_więcej) albo None, gdy nie ma wpisu lub wygasł."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        metrics.cache_requests.inc("result", "miss" if entry is None else "hit")
+        if entry is None:
+            return None
+
+        data, path, _, _ = entry
+        try:
+            if path is not None:
+                with open(path, "rb") as f:
+                    data = f.read()
+            return pickle.loads(data)
+        except Exception:
+            # Plik zniknął (np. sprzątanie /tmp) albo jest uszkodzony - traktujemy jak brak wpisu
+            self.invalidate(key)
+            return None
+
+    def generation(self, project_id: int) -> int:
+        """Odczytywana przed wykonaniem zapytania i przekazywana do put()."""
+        with self._lock:
+            return self._generations.get(project_id, 0)
+
+    def put(self, key: tuple, value: tuple, ttl: float, generation: int | None = None):
+        """
+        Zapisuje wynik. Gdy podano generation, a projekt został w międzyczasie unieważniony
+        (zapis w trakcie wykonywania zapytania), wynik może być nieaktualny i nie trafia do cache.
+        """
+        if generation is not None and self.generation(key[0]) != generation:
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        size = len(data)
+        path = None
+        if size > self.spill_bytes:
+            if size > self.max_disk_bytes:
+                return
+            path = self._spill(key, data)
+            data = None
+        elif size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation is not None and self._generations.get(key[0], 0) != generation:
+                if path is not None:
+                    self._remove_file(path)
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (data, path, size, time.monotonic() + ttl)
+            if path is None:
+                self._memory += size
+            else:
+                self._disk += size
+            # Wyrzucamy najdawniej używane, aż zmieścimy się w limitach
+            while self._memory > self.max_bytes or self._disk > self.max_disk_bytes:
+                oldest = next(iter(self._entries))
+                if oldest == key:
+                    break
+                self._drop(oldest)
+
+    def _spill(self, key: tuple, data: bytes) -> str:
+        """
+        Zapisuje wynik do własnego pliku: najpierw pod tymczasową nazwą, potem os.replace,
+        więc równoległy get() nigdy nie czyta połowy pliku, a dwa zapisy tego samego klucza
+        nie nadpisują sobie nawzajem plików.
+        """
+        os.makedirs(self.spill_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.spill_dir, prefix=f"{key[0]}-{key[1][:16]}-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            path = tmp[:-len(".tmp")] + ".pkl"
+            os.replace(tmp, path)
+        except BaseException:
+            self._remove_file(tmp)
+            raise
+        return path
+
+    def invalidate(self, key: tuple):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def invalidate_project(self, project_id: int):
+        """Po zapisie do bazy projektu żaden z jego wyników nie jest już pewny."""
+        with self._lock:
+            self._generations[project_id] = self._generations.get(project_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == project_id]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
+            self._disk = 0
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "memory_bytes": self._memory,
+                "disk_bytes": self._disk,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _drop(self, key: tuple):
+        data, path, size, _ = self._entries.pop(key)
+        if path is None:
+            self._memory -= size
+        else:
+            self._disk -= size
+            self._remove_file(path)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
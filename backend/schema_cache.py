@@ -0,0 +1,242 @@
+import hashlib
+import json
+import threading
+import time
+
+from sqlalchemy import Engine, inspect, text
+
+import encoding
+import metrics
+from schema_index import SchemaIndex
+
+# Jedno zapytanie do katalogu zamiast get_columns() dla każdej tabeli (N+1)
+_POSTGRES_COLUMNS = text("""
+    SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod),
+           col_description(a.attrelid, a.attnum), obj_description(c.oid, 'pg_class')
+    FROM pg_catalog.pg_attribute a
+    JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = current_schema()
+      AND c.relkind IN ('r', 'p')
+      AND a.attnum > 0
+      AND NOT a.attisdropped
+    ORDER BY c.relname, a.attnum
+""")
+
+_POSTGRES_FOREIGN_KEYS = text("""
+    SELECT DISTINCT src.relname, dst.relname
+    FROM pg_catalog.pg_constraint con
+    JOIN pg_catalog.pg_class src ON src.oid = con.conrelid
+    JOIN pg_catalog.pg_class dst ON dst.oid = con.confrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = src.relnamespace
+    WHERE con.contype = 'f' AND n.nspname = current_schema()
+""")
+
+_MYSQL_COLUMNS = text("""
+    SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, c.COLUMN_COMMENT, t.TABLE_COMMENT
+    FROM information_schema.COLUMNS c
+    JOIN information_schema.TABLES t
+      ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+    WHERE c.TABLE_SCHEMA = DATABASE()
+      AND t.TABLE_TYPE = 'BASE TABLE'
+    ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+""")
+
+_MYSQL_FOREIGN_KEYS = text("""
+    SELECT DISTINCT TABLE_NAME, REFERENCED_TABLE_NAME
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+""")
+
+
+class SchemaSnapshot:
+    """
+    Migawka schematu bazy klienta: {tabela: [(kolumna, typ)]} plus klucze obce i komentarze.
+    Tekst dla AI, drzewo dla PrimeVue i indeks wyszukiwania są liczone leniwie i tylko raz na migawkę.
+    """
+
+    def __init__(self, tables: dict[str, list[tuple[str, str]]],
+                 foreign_keys: list[tuple[str, str]] | None = None,
+                 comments: dict[str, str] | None = None):
+        self.tables = tables
+        # Pary (tabela, tabela do której wskazuje klucz obcy)
+        self.foreign_keys = sorted(set(foreign_keys or []))
+        # Komentarze: klucz "tabela" albo "tabela.kolumna"
+        self.comments = comments or {}
+        self.fingerprint = hashlib.sha256(
+            json.dumps([tables, self.foreign_keys, self.comments], sort_keys=True).encode()
+        ).hexdigest()
+        self._prompt_text = None
+        self._tree = None
+        self._tree_bodies: dict[str, tuple[bytes, str]] = {}
+        self._index = None
+
+    def structure(self) -> dict:
+        """Słownik {tabela: ["kolumna (TYP)"]}, jak dawniej inspect_schema_structure."""
+        return {
+            table: [f"{name} ({col_type})" for name, col_type in columns]
+            for table, columns in self.tables.items()
+        }
+
+    def table_line(self, table: str) -> str:
+        # Formatujemy jako: nazwa_kolumny (typ)
+        cols_desc = ", ".join(f"{name} ({col_type})" for name, col_type in self.tables[table])
+        return f"Tabela {table}: [{cols_desc}]"
+
+    def neighbours(self, table: str) -> set[str]:
+        """Tabele połączone z daną tabelą kluczem obcym (w obie strony)."""
+        return {dst for src, dst in self.foreign_keys if src == table} | \
+               {src for src, dst in self.foreign_keys if dst == table}
+
+    def prompt_text(self) -> str:
+        if self._prompt_text is None:
+            schema_info = [self.table_line(table) for table in self.tables]
+
+            if not schema_info:
+                self._prompt_text = "Baza jest pusta (brak tabel)."
+            else:
+                self._prompt_text = "\n".join(schema_info)
+        return self._prompt_text
+
+    def index(self) -> SchemaIndex:
+        """Indeks BM25 po nazwach i komentarzach tabel/kolumn (do przycinania promptu)."""
+        if self._index is None:
+            self._index = SchemaIndex(self)
+        return self._index
+
+    def tree(self) -> list:
+        """Węzły w formacie PrimeVue Tree (key, label, icon, children)."""
+        if self._tree is None:
+            # Zakładamy schemat 'public' dla uproszczenia, można to rozbudować
+            public_node = {
+                "key": "0",
+                "label": "public",
+                "icon": "pi pi-database",
+                "children": []
+            }
+
+            for idx, (table_name, columns) in enumerate(self.structure().items()):
+                table_key = f"0-{idx}"
+                public_node["children"].append({
+                    "key": table_key,
+                    "label": table_name,
+                    "icon": "pi pi-table",
+                    "children": [
+                        {
+                            "key": f"{table_key}-{col_idx}",
+                            "label": col_def,
+                            "icon": "pi pi-tag",
+                            "selectable": False
+                        } for col_idx, col_def in enumerate(columns)
+                    ]
+                })
+
+            self._tree = [public_node]
+        return self._tree
+
+    def tree_body(self, db_type: str) -> tuple[bytes, str]:
+        """Gotowe body odpowiedzi /schema (JSON) i jego ETag - serializowane raz na migawkę."""
+        if db_type not in self._tree_bodies:
+            body = json.dumps({"schema": self.tree(), "database_type": db_type}).encode()
+            self._tree_bodies[db_type] = (body, encoding.etag(body))
+        return self._tree_bodies[db_type]
+
+    def tree_etags(self) -> set[str]:
+        return {tag for _, tag in self._tree_bodies.values()}
+
+
+def load_snapshot(engine: Engine) -> SchemaSnapshot:
+    """Pobiera cały schemat jednym zapytaniem do katalogu (plus jedno o klucze obce)."""
+    dialect = engine.dialect.name
+    tables: dict[str, list[tuple[str, str]]] = {}
+    foreign_keys: list[tuple[str, str]] = []
+    comments: dict[str, str] = {}
+
+    if dialect in ("postgresql", "mysql"):
+        if dialect == "postgresql":
+            columns_query, fk_query = _POSTGRES_COLUMNS, _POSTGRES_FOREIGN_KEYS
+        else:
+            columns_query, fk_query = _MYSQL_COLUMNS, _MYSQL_FOREIGN_KEYS
+        with engine.connect() as conn:
+            for table, column, col_type, col_comment, table_comment in conn.execute(columns_query):
+                tables.setdefault(table, []).append((column, str(col_type).upper()))
+                if col_comment:
+                    comments[f"{table}.{column}"] = col_comment
+                if table_comment:
+                    comments[table] = table_comment
+            foreign_keys = [(src, dst) for src, dst in conn.execute(fk_query)]
+    else:
+        # Inne dialekty: zbiorcze get_multi_* z SQLAlchemy
+        inspector = inspect(engine)
+        for (_, table), columns in sorted(inspector.get_multi_columns().items()):
+            tables[table] = [(col["name"], str(col["type"])) for col in columns]
+            for col in columns:
+                if col.get("comment"):
+                    comments[f"{table}.{col['name']}"] = col["comment"]
+        for (_, table), fks in inspector.get_multi_foreign_keys().items():
+            foreign_keys.extend((table, fk["referred_table"]) for fk in fks)
+
+    return SchemaSnapshot(tables, foreign_keys, comments)
+
+
+class SchemaCache:
+    """Migawki schematów per projekt z wygasaniem po ttl sekundach."""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        # project_id -> (migawka, czas pobrania)
+        self._snapshots: dict[int, tuple[SchemaSnapshot, float]] = {}
+        self._locks: dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+        # Funkcje wołane z id projektu, gdy schemat projektu się zmienił
+        self.listeners = []
+
+    def get(self, project_id: int, engine: Engine) -> SchemaSnapshot:
+        entry = self._snapshots.get(project_id)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            metrics.cache_requests.inc("schema", "hit")
+            return entry[0]
+        metrics.cache_requests.inc("schema", "miss")
+        with self._project_lock(project_id):
+            # Inne żądanie mogło już odświeżyć schemat, czekając na lock
+            entry = self._snapshots.get(project_id)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            return self._reload(project_id, engine)[0]
+
+    def peek(self, project_id: int) -> SchemaSnapshot | None:
+        """Aktualna migawka bez pobierania schematu (None, gdy jej nie ma albo wygasła)."""
+        entry = self._snapshots.get(project_id)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def refresh(self, project_id: int, engine: Engine) -> tuple[SchemaSnapshot, bool]:
+        """
+        Pobiera schemat ponownie. Zwraca (migawka, czy_się_zmienił).
+        Jeśli fingerprint się nie zmienił, zostaje stara migawka razem z gotowym tekstem i drzewem.
+        """
+        with self._project_lock(project_id):
+            return self._reload(project_id, engine)
+
+    def invalidate(self, project_id: int):
+        self._snapshots.pop(project_id, None)
+        for listener in self.listeners:
+            listener(project_id)
+
+    def _reload(self, project_id: int, engine: Engine) -> tuple[SchemaSnapshot, bool]:
+        with metrics.timed("schema_introspection"):
+            fresh = load_snapshot(engine)
+        old = self._snapshots.get(project_id)
+        changed = old is None or old[0].fingerprint != fresh.fingerprint
+        snapshot = fresh if changed else old[0]
+        self._snapshots[project_id] = (snapshot, time.monotonic())
+        if changed and old is not None:
+            for listener in self.listeners:
+                listener(project_id)
+        return snapshot, changed
+
+    def _project_lock(self, project_id: int) -> threading.Lock:
+        # Jeden odczyt katalogu naraz na projekt
+        with self._lock:
+            return self._locks.setdefault(project_id, threading.Lock())
@@ -0,0 +1,109 @@
+import math
+import re
+from collections import Counter
+
+# Parametry BM25
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(value: str) -> list[str]:
+    """Dzieli nazwy typu order_items / OrderItems i zwykły tekst na małe tokeny bez liczby mnogiej."""
+    value = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", value)
+    tokens = []
+    for token in re.findall(r"[^\W_]+", value.lower()):
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def estimate_tokens(value: str) -> int:
+    # Przybliżenie: ~4 znaki na token
+    return max(1, len(value) // 4)
+
+
+class SchemaIndex:
+    """Indeks BM25: jeden dokument na tabelę (nazwa tabeli liczona podwójnie, kolumny, komentarze)."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.docs: dict[str, Counter] = {}
+        for table, columns in snapshot.tables.items():
+            tokens = tokenize(table) * 2
+            tokens += tokenize(snapshot.comments.get(table, ""))
+            for name, _ in columns:
+                tokens += tokenize(name)
+                tokens += tokenize(snapshot.comments.get(f"{table}.{name}", ""))
+            self.docs[table] = Counter(tokens)
+
+        self.avg_len = sum(sum(doc.values()) for doc in self.docs.values()) / max(len(self.docs), 1)
+        document_frequency = Counter()
+        for doc in self.docs.values():
+            document_frequency.update(doc.keys())
+        n = len(self.docs)
+        self.idf = {
+            token: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for token, df in document_frequency.items()
+        }
+
+    def rank(self, question: str) -> list[tuple[str, float]]:
+        """Tabele z dodatnim wynikiem, od najlepiej pasującej."""
+        query = set(tokenize(question))
+        scores = []
+        for table, doc in self.docs.items():
+            length = sum(doc.values())
+            score = 0.0
+            for token in query:
+                tf = doc.get(token, 0)
+                if tf:
+                    score += self.idf[token] * tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * length / self.avg_len))
+            if score > 0:
+                scores.append((table, score))
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores
+
+    def select_context(self, question: str, top_k: int, token_budget: int) -> tuple[str, dict]:
+        """
+        Zwraca (tekst schematu do promptu, statystyki). Gdy cały schemat mieści się w budżecie,
+        zwraca go w całości. W przeciwnym razie bierze top_k tabel i ich sąsiadów po kluczach
+        obcych, dopóki mieści się w budżecie tokenów.
+        """
+        full_text = self.snapshot.prompt_text()
+        full_tokens = estimate_tokens(full_text)
+        stats = {
+            "tables_total": len(self.docs),
+            "tables_kept": len(self.docs),
+            "prompt_tokens_full": full_tokens,
+            "prompt_tokens": full_tokens,
+            "prompt_tokens_saved": 0,
+        }
+        if full_tokens <= token_budget:
+            return full_text, stats
+
+        ranked = [table for table, _ in self.rank(question)[:top_k]]
+        candidates = []
+        for table in ranked:
+            candidates.append(table)
+            candidates.extend(sorted(self.snapshot.neighbours(table)))
+        if not candidates:
+            # Nic nie pasuje do pytania - bierzemy tabele po kolei aż do budżetu
+            candidates = list(self.snapshot.tables)
+
+        lines, used, kept = [], 0, set()
+        for table in candidates:
+            if table in kept:
+                continue
+            line = self.snapshot.table_line(table)
+            cost = estimate_tokens(line) + 1
+            if used + cost > token_budget:
+                continue
+            lines.append(line)
+            used += cost
+            kept.add(table)
+
+        text = "\n".join(lines)
+        stats["tables_kept"] = len(kept)
+        stats["prompt_tokens"] = estimate_tokens(text)
+        stats["prompt_tokens_saved"] = full_tokens - stats["prompt_tokens"]
+        return text, stats
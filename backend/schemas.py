@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any, Dict, Literal
 
 from datetime import datetime
 
@@ -13,6 +13,11 @@ class ProjectCreate(BaseModel):
     dbName: str
     dbUser: str
     dbPassword: str
+    statementTimeoutMs: Optional[int] = None # limit czasu zapytań na bazie projektu
+    resultCacheTtl: Optional[int] = None # sekundy; włącza cache wyników /run dla projektu
+    preflightMode: Optional[Literal["off", "warn", "reject"]] = None # EXPLAIN przed /run
+    preflightMaxCost: Optional[float] = None
+    preflightMaxRows: Optional[int] = None
 
 class ProjectResponse(ProjectCreate):
     id: int
@@ -29,14 +34,39 @@ class AskHistory(BaseModel):
 class AskRequest(BaseModel):
     question: str
     history: List[AskHistory] | None = None
+    # Sprawdź plan wygenerowanego SQL i przy zbyt wysokim koszcie poproś LLM o tańszy (raz)
+    preflight: Optional[bool] = None
 
 class RunSQLRequest(BaseModel):
     sql: str
+    # Stronicowanie: page_size + offset albo cursor (next_cursor z poprzedniej strony)
+    page_size: Optional[int] = None
+    offset: int = 0
+    cursor: Optional[str] = None
+    # Limit wierszy dla tego zapytania (i tak nie więcej niż RUN_MAX_ROWS z configu)
+    max_rows: Optional[int] = None
+    # Własne id zapytania, żeby można było je anulować (/projects/{id}/queries/{query_id}/cancel)
+    query_id: Optional[str] = None
+    # Wpis historii (history_id z /ask), którego SQL jest wykonywany - do telemetrii wykonania
+    historyId: Optional[int] = None
+    # EXPLAIN przed wykonaniem: True wymusza (jako ostrzeżenie), False pomija tryb "warn" projektu
+    preflight: Optional[bool] = None
+
+class RunScriptRequest(BaseModel):
+    sql: str
+    # Limit wierszy zwracanych przez każdą instrukcję zwracającą wyniki
+    max_rows: Optional[int] = None
+    query_id: Optional[str] = None
+
+class JobCreate(BaseModel):
+    sql: str
 
 class QueryResult(BaseModel):
     columns: List[str]
     data: List[dict]
     generated_sql: Optional[str] = None
+    truncated: bool = False
+    next_cursor: Optional[str] = None
 
 class ConnectionConfig(BaseModel):
     host: str
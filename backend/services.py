@@ -1,44 +1,128 @@
+import base64
+import os
+import hashlib
+import json
+import re
+import time
+
 from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.pool import NullPool
 # Import flagi do obsługi wielu zapytań w MySQL
 from pymysql.constants import CLIENT 
 
 from schemas import ConnectionConfig
 from client import Client
+from llm_scheduler import LLMScheduler, INTERACTIVE
 from config import Settings
+from registry import EngineRegistry
+from schema_cache import SchemaCache, SchemaSnapshot, load_snapshot
+from sql_cache import SQLCache
+from result_cache import ResultCache
+from execution import ProjectLimiter, RunningQueries, apply_statement_timeout, install_session_reset
+from jobs import JobManager
+import metrics
+import sql_script
+import bulk_import
+import preflight
 
-def create_temp_engine(config: ConnectionConfig):
-    """Tworzy silnik SQLAlchemy na podstawie konfiguracji z formularza (test połączenia)."""
+# Jeden silnik (jedna pula) na projekt, współdzielony między żądaniami
+engine_registry = EngineRegistry()
+# Migawki schematów baz klientów, wspólne dla /ask i /schema
+schema_cache = SchemaCache()
+# Wygenerowane SQL per (projekt, schemat, pytanie, historia); zmiana schematu czyści wpisy projektu
+sql_cache = SQLCache()
+schema_cache.listeners.append(sql_cache.invalidate_project)
+# Wyniki SELECT-ów z /run dla projektów, które włączyły cache; zapis do bazy projektu czyści jego wpisy
+result_cache = ResultCache()
+# Działające zapytania (do anulowania) i limit równoległych wykonań per projekt
+running_queries = RunningQueries()
+run_limiter = ProjectLimiter()
+# Długie zapytania w tle z wynikami zrzucanymi na dysk
+job_manager = JobManager()
+_target_pool_options = {"pool_size": 5, "max_overflow": 5, "pool_recycle": 1800}
+# SQLite jako baza projektu daje dostęp do plików serwera - domyślnie wyłączone
+_target_access = {"allow_sqlite": False}
+# Ile tabel (plus sąsiedzi po FK) i ile tokenów schematu trafia do promptu
+_schema_prompt_options = {"top_k": 15, "token_budget": 6000}
+
+def configure_target_engines(settings: Settings):
+    """Ustawia limity rejestru i pul do baz klientów (wołane przy starcie aplikacji)."""
+    engine_registry.configure(max_size=settings.target_engine_cache_size, ttl=settings.target_engine_ttl)
+    schema_cache.ttl = settings.schema_cache_ttl
+    sql_cache.max_size = settings.sql_cache_size
+    result_cache.configure(
+        settings.result_cache_max_bytes, settings.result_cache_spill_bytes,
+        settings.result_cache_dir, settings.result_cache_disk_bytes
+    )
+    run_limiter.max_concurrent = settings.run_max_concurrent
+    run_limiter.max_queue = settings.run_max_queue
+    job_manager.configure(settings.jobs_spool_dir, settings.jobs_workers, settings.jobs_ttl)
+    _schema_prompt_options.update(
+        top_k=settings.schema_prompt_top_k,
+        token_budget=settings.schema_prompt_token_budget,
+    )
+    _target_pool_options.update(
+        pool_size=settings.target_pool_size,
+        max_overflow=settings.target_max_overflow,
+    )
+    _target_access["allow_sqlite"] = settings.allow_sqlite_targets
+
+def target_type_allowed(db_type: str) -> bool:
+    return db_type != "sqlite" or _target_access["allow_sqlite"]
+
+def _connection_url(db_type: str, user: str, password: str, host: str, port: int, database: str):
+    """Zwraca (url, connect_args) dla danego typu bazy."""
     url = ""
-    connect_args = {} 
+    connect_args = {}
 
-    if config.type == "postgres" or config.type == "postgresql":
-        url = f"postgresql://{config.username}:{config.password}@{config.host}:{config.port}/{config.database}"
-    elif config.type == "mysql":
-        url = f"mysql+pymysql://{config.username}:{config.password}@{config.host}:{config.port}/{config.database}"
+    if db_type == "postgres" or db_type == "postgresql":
+        url = f"postgresql://{user}:{password}@{host}:{port}/{database}"
+    elif db_type == "mysql":
+        url = f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}"
         # Włącz obsługę wielu zapytań dla MySQL (multi-statements)
-        connect_args["client_flag"] = CLIENT.MULTI_STATEMENTS 
+        connect_args["client_flag"] = CLIENT.MULTI_STATEMENTS
+    elif db_type == "sqlite":
+        # Lokalny plik (benchmarki, testy) - dbName to ścieżka do pliku; tylko z ALLOW_SQLITE_TARGETS
+        if not target_type_allowed(db_type):
+            raise ValueError("Bazy SQLite są wyłączone (ALLOW_SQLITE_TARGETS)")
+        url = f"sqlite:///{database}"
+
+    return url, connect_args
 
-    # pool_pre_ping sprawdza czy połączenie żyje przed jego użyciem
-    return create_engine(url, pool_pre_ping=True, connect_args=connect_args)
+def create_temp_engine(config: ConnectionConfig):
+    """Tworzy silnik SQLAlchemy na podstawie konfiguracji z formularza (test połączenia)."""
+    url, connect_args = _connection_url(config.type, config.username, config.password, config.host, config.port, config.database)
+
+    # Jednorazowe połączenie - bez puli, żeby nic nie zostawało otwarte po teście
+    return create_engine(url, poolclass=NullPool, connect_args=connect_args)
+
+def check_connection(config: ConnectionConfig):
+    """Łączy się z bazą z formularza i od razu zamyka silnik (rzuca wyjątek gdy się nie da)."""
+    new_engine = create_temp_engine(config)
+    try:
+        with new_engine.connect() as conn:
+            pass # Udało się połączyć
+    finally:
+        new_engine.dispose()
 
 def get_db_schema(engine) -> str:
     """Pobiera strukturę tabel z bazy danych jako tekst (dla AI)."""
-    inspector = inspect(engine)
-    schema_info = []
-    
-    for table_name in inspector.get_table_names():
-        columns = inspector.get_columns(table_name)
-        # Formatujemy jako: nazwa_kolumny (typ)
-        cols_desc = ", ".join([f"{col['name']} ({col['type']})" for col in columns])
-        schema_info.append(f"Tabela {table_name}: [{cols_desc}]")
-        
-    if not schema_info:
-        return "Baza jest pusta (brak tabel)."
-        
-    return "\n".join(schema_info)
+    return load_snapshot(engine).prompt_text()
 
-def generate_sql_with_ollama(client: Client, question: str, schema: str, db_type: str, history: list | None = None) -> str:
-    """Wysyła prompt do Ollamy i zwraca czysty SQL."""
+def get_project_schema(project_model, engine) -> SchemaSnapshot:
+    """Zwraca migawkę schematu projektu z cache (odświeżaną po TTL)."""
+    return schema_cache.get(project_model.id, engine)
+
+def select_schema_context(snapshot: SchemaSnapshot, question: str) -> tuple[str, dict]:
+    """Tekst schematu przycięty do tabel związanych z pytaniem + statystyki oszczędzonych tokenów."""
+    return snapshot.index().select_context(
+        question,
+        _schema_prompt_options["top_k"],
+        _schema_prompt_options["token_budget"]
+    )
+
+def build_sql_messages(question: str, schema: str, db_type: str, history: list | None = None) -> list:
+    """Buduje listę wiadomości dla Ollamy (prompt systemowy + historia + pytanie)."""
     
     # ZAKTUALIZOWANY PROMPT:
     # Dodano punkt 6, który zabrania tworzenia nowych baz danych.
@@ -67,12 +151,31 @@ def generate_sql_with_ollama(client: Client, question: str, schema: str, db_type
             messages.append({"role": role, "content": content})
 
     messages.append({"role": "user", "content": question})
-    response = client.chat(messages=messages)
-    
-    sql = response['message']['content']
+    return messages
+
+def clean_sql(content: str) -> str:
     # Oczyszczanie wyniku
-    sql = sql.replace("```sql", "").replace("```", "").strip()
-    return sql
+    return content.replace("```sql", "").replace("```", "").strip()
+
+def generate_sql_with_ollama(client: Client, question: str, schema: str, db_type: str, history: list | None = None) -> str:
+    """Wysyła prompt do Ollamy i zwraca czysty SQL."""
+    messages = build_sql_messages(question, schema, db_type, history)
+    with metrics.timed("llm"):
+        response = client.chat(messages=messages)
+    return clean_sql(response['message']['content'])
+
+async def agenerate_sql_with_ollama(client: LLMScheduler, question: str, schema: str, db_type: str, history: list | None = None, priority: int = INTERACTIVE) -> str:
+    """Jak generate_sql_with_ollama, ale bez blokowania pętli zdarzeń (przez kolejkę LLM)."""
+    messages = build_sql_messages(question, schema, db_type, history)
+    with metrics.timed("llm"):
+        response = await client.achat(messages=messages, priority=priority)
+    return clean_sql(response['message']['content'])
+
+async def astream_sql_with_ollama(client: LLMScheduler, question: str, schema: str, db_type: str, history: list | None = None, priority: int = INTERACTIVE):
+    """Zwraca kolejne tokeny odpowiedzi Ollamy (bez czyszczenia - robi to clean_sql na końcu)."""
+    messages = build_sql_messages(question, schema, db_type, history)
+    async for token in client.achat_stream(messages=messages, priority=priority):
+        yield token
 
 def execute_query(engine, sql: str):
     """
@@ -95,29 +198,357 @@ def execute_query(engine, sql: str):
                 "rows_affected": result.rowcount
             }]
 
+def _is_single_select(sql: str) -> bool:
+    """
+    Czy to pojedynczy SELECT/WITH tylko do odczytu, który można owinąć podzapytaniem i czytać
+    kursorem po stronie serwera. WITH z DELETE/UPDATE, SELECT ... INTO itp. (classify_sql = "write")
+    muszą zostać na najwyższym poziomie, więc wykonujemy je bez zmian.
+    """
+    body = sql.strip().rstrip(";").strip()
+    first_word = body.split(None, 1)[0].lower() if body else ""
+    return first_word in ("select", "with") and classify_sql(sql) == "read"
+
+# Słowa, po których zapytanie może coś zmienić w bazie (albo zablokować wiersze)
+_WRITE_WORDS = {
+    "insert", "update", "delete", "merge", "replace", "upsert", "create", "drop", "alter",
+    "truncate", "grant", "revoke", "copy", "call", "do", "lock", "vacuum", "analyze", "refresh",
+    "set", "reset", "into", "for", "nextval", "setval", "load", "handler", "rename", "comment",
+}
+_READ_STARTS = {"select", "with", "show", "explain", "describe", "desc", "values", "table"}
+# Funkcje, które wywołane w SELECT coś robią (zabijają sesje, biorą locki, piszą pliki, czekają)
+_SIDE_EFFECT_FUNCTIONS = {
+    "pg_terminate_backend", "pg_cancel_backend", "pg_reload_conf", "pg_rotate_logfile", "pg_switch_wal",
+    "pg_notify", "pg_sleep", "set_config", "txid_current", "lo_import", "lo_export", "lo_unlink", "lo_create",
+    "get_lock", "release_lock", "release_all_locks", "sleep", "benchmark",
+}
+_SIDE_EFFECT_PREFIXES = ("pg_advisory", "pg_try_advisory", "pg_create_", "pg_drop_", "pg_replication_", "pg_stat_reset", "dblink")
+
+def classify_sql(sql: str) -> str:
+    """
+    Zgrubna klasyfikacja: "read" dla pojedynczego zapytania tylko do odczytu, w pozostałych
+    przypadkach "write". W razie wątpliwości zawsze "write" - takie zapytanie nie trafi do cache.
+    """
+    # Bez komentarzy, literałów i identyfikatorów w cudzysłowach (mogą zawierać dowolne słowa)
+    body = re.sub(r"--[^\n]*|/\*.*?\*/", " ", sql, flags=re.S)
+    body = re.sub(r"\$(\w*)\$.*?\$\1\$|'(?:[^'\\]|''|\\.)*'|\"[^\"]*\"|`[^`]*`", " ? ", body, flags=re.S)
+    statements = [s for s in body.split(";") if s.strip()]
+    if len(statements) != 1:
+        return "write"
+    words = re.findall(r"[a-z_]+", statements[0].lower())
+    if not words or words[0] not in _READ_STARTS:
+        return "write"
+    if _WRITE_WORDS.intersection(words):
+        return "write"
+    if any(word in _SIDE_EFFECT_FUNCTIONS or word.startswith(_SIDE_EFFECT_PREFIXES) for word in words):
+        return "write"
+    return "read"
+
+def note_write(project_id: int | None, sql: str):
+    """Zapytanie, które mogło zmienić dane, unieważnia cache wyników projektu."""
+    if project_id is not None and classify_sql(sql) != "read":
+        result_cache.invalidate_project(project_id)
+
+def preflight_query(engine, sql: str, timeout_ms: int | None = None) -> dict | None:
+    """
+    EXPLAIN zapytania (bez wykonania) i podsumowanie planu. None, gdy preflight nie ma sensu
+    (wiele instrukcji, nieobsługiwany dialekt) albo EXPLAIN się nie udał - wtedy błąd pokaże samo wykonanie.
+    """
+    if not preflight.explainable(sql):
+        return None
+    conn = open_query_connection(engine, timeout_ms)
+    try:
+        with metrics.timed("preflight"):
+            return preflight.explain(conn, sql)
+    except Exception:
+        return None
+    finally:
+        conn.rollback()
+        close_query_connection(conn)
+
+def encode_page_cursor(sql: str, offset: int) -> str:
+    """Token kontynuacji: offset następnej strony + skrót zapytania."""
+    payload = {"o": offset, "h": hashlib.sha1(sql.encode()).hexdigest()[:16]}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_page_cursor(sql: str, cursor: str) -> int:
+    """Zwraca offset z tokenu; ValueError gdy token jest zły albo od innego zapytania."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset = int(payload["o"])
+        digest = payload["h"]
+    except Exception:
+        raise ValueError("Nieprawidłowy cursor")
+    if digest != hashlib.sha1(sql.encode()).hexdigest()[:16] or offset < 0:
+        raise ValueError("Cursor nie pasuje do zapytania")
+    return offset
+
+def open_query_connection(engine, timeout_ms: int | None = None, query_id: str | None = None, project_id: int | None = None):
+    """Połączenie do wykonania zapytania użytkownika: z timeoutem i zarejestrowane do anulowania."""
+    with metrics.timed("connect"):
+        conn = engine.connect()
+    try:
+        apply_statement_timeout(conn, timeout_ms)
+        if query_id:
+            running_queries.add(query_id, project_id, engine, conn)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+def close_query_connection(conn, query_id: str | None = None):
+    if query_id:
+        running_queries.remove(query_id)
+    conn.close()
+
+# Po tych słowach (na najwyższym poziomie) nie można po prostu dopisać LIMIT na końcu zapytania MySQL
+_MYSQL_NO_LIMIT_APPEND = {"limit", "for", "into", "lock", "procedure"}
+
+def _page_statement(sql: str, dialect: str) -> str | None:
+    """SELECT ograniczony do strony (:_limit, :_offset) albo None, gdy wiersze trzeba przewinąć kursorem."""
+    if dialect not in ("postgresql", "mysql") or not _is_single_select(sql):
+        return None
+    inner = sql.strip().rstrip(";")
+    if dialect == "postgresql":
+        return f"SELECT * FROM ({inner}) AS _page LIMIT :_limit OFFSET :_offset"
+    # MySQL odrzuca powtórzone nazwy kolumn w tabeli pochodnej (błąd 1060, np. SELECT * z JOIN),
+    # więc zamiast podzapytania dopisujemy LIMIT - o ile zapytanie nie ma własnego
+    if _MYSQL_NO_LIMIT_APPEND & sql_script.top_level_words(inner, dialect):
+        return None
+    return f"{inner} LIMIT :_limit OFFSET :_offset"
+
+def execute_query_page(engine, sql: str, limit: int, offset: int = 0,
+                       timeout_ms: int | None = None, query_id: str | None = None, project_id: int | None = None):
+    """
+    Wykonuje zapytanie i zwraca tylko jedną stronę wyników: (kolumny, wiersze jako krotki, czy_jest_więcej).
+    Dla pojedynczego SELECT na postgres/mysql limit jest dokładany w SQL,
+    w pozostałych przypadkach wiersze są czytane przez fetchmany.
+    """
+    # Pobieramy jeden wiersz więcej, żeby wiedzieć czy jest następna strona
+    fetch = limit + 1
+    page_sql = _page_statement(sql, engine.dialect.name)
+    wrap = page_sql is not None
+
+    conn = open_query_connection(engine, timeout_ms, query_id, project_id)
+    try:
+        note_write(project_id, sql)
+        with metrics.timed("execute"):
+            if wrap:
+                result = conn.execute(text(page_sql), {"_limit": fetch, "_offset": offset})
+            elif _is_single_select(sql):
+                result = conn.execution_options(stream_results=True).execute(text(sql))
+            else:
+                # Kursor po stronie serwera tylko dla SELECT - postgres nie zrobi DECLARE CURSOR dla INSERT/DDL
+                result = conn.execute(text(sql))
+
+        if not result.returns_rows:
+            conn.commit()
+            return ["status", "message", "rows_affected"], [
+                ("Sukces", "Operacja wykonana pomyślnie.", result.rowcount)
+            ], False
+
+        keys = list(result.keys())
+        if not wrap and offset:
+            # Przewijamy kursor do offsetu paczkami
+            skipped = 0
+            while skipped < offset:
+                chunk = result.fetchmany(min(offset - skipped, 1000))
+                if not chunk:
+                    break
+                skipped += len(chunk)
+        with metrics.timed("fetch"):
+            rows = result.fetchmany(fetch)
+        result.close()
+        conn.commit()
+    finally:
+        close_query_connection(conn, query_id)
+        # Drugi raz po wykonaniu - wynik zapisany w międzyczasie przez inne żądanie też jest nieaktualny
+        note_write(project_id, sql)
+
+    has_more = len(rows) > limit
+    # Słowniki (jeśli w ogóle) buduje dopiero warstwa kodowania odpowiedzi
+    return keys, [tuple(row) for row in rows[:limit]], has_more
+
+def execute_script(engine, sql: str, max_rows: int, timeout_ms: int | None = None,
+                   query_id: str | None = None, project_id: int | None = None) -> list[dict]:
+    """
+    Wykonuje skrypt instrukcja po instrukcji na jednym połączeniu i w jednej transakcji.
+    Kolejne INSERT ... VALUES do tej samej tabeli idą jako jeden wielowierszowy INSERT.
+    Zwraca wyniki per instrukcja (rowcount, czas, ewentualnie wiersze). Błąd cofa całą transakcję
+    i leci jako ScriptError z numerem instrukcji.
+    """
+    dialect = engine.dialect.name
+    with metrics.timed("parse"):
+        batches = sql_script.batch_inserts(sql_script.split_statements(sql, dialect), dialect)
+
+    results = []
+    conn = open_query_connection(engine, timeout_ms, query_id, project_id)
+    try:
+        note_write(project_id, sql)
+        # Bez parametrów sterownik nie interpretuje % ani :nazwa w treści skryptu
+        raw = conn.execution_options(no_parameters=True)
+        for index, count, statement in batches:
+            start = time.perf_counter()
+            try:
+                with metrics.timed("execute"):
+                    result = raw.exec_driver_sql(statement)
+                entry = {"index": index, "statements": count, "sql": statement[:200]}
+                if result.returns_rows:
+                    rows = result.fetchmany(max_rows + 1)
+                    result.close()
+                    entry["columns"] = list(result.keys())
+                    entry["data"] = [tuple(row) for row in rows[:max_rows]]
+                    entry["truncated"] = len(rows) > max_rows
+                    entry["rowcount"] = len(entry["data"])
+                else:
+                    entry["rowcount"] = result.rowcount
+            except Exception as e:
+                conn.rollback()
+                raise ScriptError(index, e, results)
+            entry["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            results.append(entry)
+        conn.commit()
+    finally:
+        close_query_connection(conn, query_id)
+        note_write(project_id, sql)
+    return results
+
+class ScriptError(Exception):
+    """Błąd instrukcji skryptu: numer instrukcji i wyniki instrukcji wykonanych przed nią (cofniętych)."""
+
+    def __init__(self, index: int, error: Exception, results: list):
+        super().__init__(str(error))
+        self.index = index
+        self.results = results
+
+def stream_query(engine, sql: str, batch_size: int = 1000,
+                 timeout_ms: int | None = None, query_id: str | None = None, project_id: int | None = None):
+    """
+    Wykonuje zapytanie z kursorem po stronie serwera (stream_results/yield_per).
+    Zwraca (kolumny, typy kolumn, iterator paczek wierszy); typy to (type_code, precision, scale)
+    z opisu kursora, do przełożenia na typy Arrow przez encoding.arrow_types. Połączenie jest trzymane do końca iteracji,
+    więc pamięć nie zależy od liczby wierszy. Błędy SQL lecą od razu, przed pierwszą paczką.
+    """
+    conn = open_query_connection(engine, timeout_ms, query_id, project_id)
+    try:
+        note_write(project_id, sql)
+        with metrics.timed("execute"):
+            if _is_single_select(sql):
+                result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(text(sql))
+            else:
+                # Zapisy i DDL bez kursora po stronie serwera (postgres nie zrobi dla nich DECLARE CURSOR)
+                result = conn.execute(text(sql))
+    except Exception:
+        close_query_connection(conn, query_id)
+        note_write(project_id, sql)
+        raise
+
+    if not result.returns_rows:
+        # Dla zapytań bez wyników (CREATE, INSERT itp.) zwracamy status jak execute_query
+        try:
+            conn.commit()
+            rows_affected = result.rowcount
+        finally:
+            close_query_connection(conn, query_id)
+            note_write(project_id, sql)
+        columns = ["status", "message", "rows_affected"]
+        return columns, [(None, None, None)] * len(columns), iter([[("Sukces", "Operacja wykonana pomyślnie.", rows_affected)]])
+
+    def batches():
+        try:
+            for partition in result.partitions(batch_size):
+                yield partition
+            conn.commit()
+        finally:
+            # Zamknięcie połączenia także gdy klient przerwie pobieranie
+            close_query_connection(conn, query_id)
+            # np. INSERT ... RETURNING zatwierdza się dopiero tutaj
+            note_write(project_id, sql)
+
+    columns = list(result.keys())
+    description = result.cursor.description or [(None,) * 7] * len(columns)
+    return columns, [(d[1], d[4], d[5]) for d in description], batches()
+
+def submit_query_job(engine, project_id: int, sql: str, timeout_ms: int | None = None):
+    """Uruchamia zapytanie w tle; wiersze lecą strumieniem prosto do plików zadania."""
+
+    def work(job, writer):
+        # Id zadania jest też id zapytania, więc anulowanie zadania anuluje zapytanie w bazie
+        columns, _, batches = stream_query(engine, sql, 1000, timeout_ms, job.id, project_id)
+        writer.set_columns(columns)
+        for batch in batches:
+            # Przerwanie pętli zamyka generator, a z nim kursor i połączenie
+            job.check_cancelled()
+            writer.write(batch)
+
+    def on_cancel(job):
+        running_queries.cancel(project_id, job.id)
+
+    return job_manager.submit(project_id, "query", work, on_cancel)
+
+def submit_import_job(engine, project_id: int, table: str, path: str, file_format: str,
+                      columns: list[str], table_columns: list[tuple[str, str]], delimiter: str = ",",
+                      batch_rows: int = 10000, timeout_ms: int | None = None):
+    """
+    Importuje plik do tabeli w tle, w jednej transakcji. job.rows rośnie z każdą paczką,
+    więc GET .../jobs/{id} pokazuje postęp i rows_per_sec. Plik jest usuwany po imporcie.
+    """
+    converters = bulk_import.make_converters(table_columns, columns)
+
+    def work(job, writer):
+        job.result = {"table": table, "format": file_format, "bytes": os.path.getsize(path)}
+        writer.set_columns(columns)
+
+        def batches():
+            for batch in bulk_import.read_batches(path, file_format, batch_rows, delimiter):
+                job.check_cancelled()
+                yield batch
+
+        def progress(rows: int):
+            job.rows += rows
+
+        try:
+            conn = open_query_connection(engine, timeout_ms, job.id, project_id)
+            try:
+                with metrics.timed("import"):
+                    if engine.dialect.name == "postgresql":
+                        bulk_import.copy_postgres(conn, table, columns, batches(), converters, progress)
+                    else:
+                        bulk_import.insert_batches(conn, table, columns, batches(), converters, progress)
+                conn.commit()
+            finally:
+                close_query_connection(conn, job.id)
+                result_cache.invalidate_project(project_id)
+        finally:
+            os.remove(path)
+        job.result["rows"] = job.rows
+
+    def on_cancel(job):
+        running_queries.cancel(project_id, job.id)
+
+    return job_manager.submit(project_id, "import", work, on_cancel)
+
 def inspect_schema_structure(engine) -> dict:
     """Zwraca słownik {tabela: [kolumny]} do budowania drzewa w frontendzie."""
-    inspector = inspect(engine)
-    structure = {}
-    
-    for table_name in inspector.get_table_names():
-        columns = inspector.get_columns(table_name)
-        cols_desc = [f"{col['name']} ({col['type']})" for col in columns]
-        structure[table_name] = cols_desc
-        
-    return structure
+    return load_snapshot(engine).structure()
 
 def get_engine_from_project(project_model):
-    from sqlalchemy import create_engine
-    
-    url = ""
-    connect_args = {}
+    """Zwraca współdzielony silnik projektu z rejestru (tworzy go przy pierwszym użyciu)."""
+    url, connect_args = _connection_url(
+        project_model.db_type, project_model.user, project_model.password,
+        project_model.host, project_model.port, project_model.db_name
+    )
+    # Zmiana danych połączenia = inny fingerprint = nowy silnik
+    fingerprint = hashlib.sha256(url.encode()).hexdigest()
 
-    if project_model.db_type == "postgres" or project_model.db_type == "postgresql":
-        url = f"postgresql://{project_model.user}:{project_model.password}@{project_model.host}:{project_model.port}/{project_model.db_name}"
-    elif project_model.db_type == "mysql":
-        url = f"mysql+pymysql://{project_model.user}:{project_model.password}@{project_model.host}:{project_model.port}/{project_model.db_name}"
-        # Włącz obsługę wielu zapytań dla MySQL
-        connect_args["client_flag"] = CLIENT.MULTI_STATEMENTS
-        
-    return create_engine(url, connect_args=connect_args)
\ No newline at end of file
+    def factory():
+        engine = create_engine(url, pool_pre_ping=True, connect_args=connect_args, **_target_pool_options)
+        install_session_reset(engine)
+        return engine
+
+    return engine_registry.get(project_model.id, fingerprint, factory)
+
+def forget_project(project_id: int):
+    """Zamyka pulę projektu i zapomina jego schemat (np. po usunięciu projektu)."""
+    engine_registry.invalidate(project_id)
+    schema_cache.invalidate(project_id)
+    result_cache.invalidate_project(project_id)
\ No newline at end of file
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+import metrics
+
+
+def normalize_question(question: str) -> str:
+    """Małe litery, pojedyncze spacje, bez końcowej interpunkcji."""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?.!; ")
+
+
+def question_key(question: str) -> str:
+    return hashlib.sha1(normalize_question(question).encode()).hexdigest()
+
+
+def history_key(history: list | None) -> str:
+    if not history:
+        return ""
+    messages = [
+        (msg.role, msg.content) if hasattr(msg, "role") else (msg["role"], msg["content"])
+        for msg in history
+    ]
+    return hashlib.sha1(json.dumps(messages).encode()).hexdigest()
+
+
+class SQLCache:
+    """
+    LRU wygenerowanych zapytań: (projekt, fingerprint schematu, pytanie, historia) -> SQL.
+    Zmiana schematu zmienia fingerprint, więc stare wpisy nigdy nie zostaną zwrócone.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(project_id: int, fingerprint: str, question: str, history: list | None = None) -> tuple:
+        return (project_id, fingerprint, question_key(question), history_key(history))
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            sql = self._entries.get(key)
+            if sql is not None:
+                self._entries.move_to_end(key)
+            return sql
+
+    def put(self, key: tuple, sql: str):
+        with self._lock:
+            self._entries[key] = sql
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def record(self, source: str | None):
+        """Zlicza wynik wyszukiwania: "memory", "history" albo None (pytanie poszło do LLM)."""
+        with self._lock:
+            if source == "memory":
+                self.hits += 1
+            elif source == "history":
+                self.db_hits += 1
+            else:
+                self.misses += 1
+        metrics.cache_requests.inc("sql", source or "miss")
+
+    def invalidate_project(self, project_id: int):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == project_id]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.db_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.db_hits) / lookups if lookups else 0.0,
+            }
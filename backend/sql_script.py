@@ -0,0 +1,227 @@
+import re
+
+# Dzielenie skryptów SQL na pojedyncze instrukcje i sklejanie kolejnych INSERT ... VALUES
+# w jeden wielowierszowy INSERT (skrypty z LLM to często tysiące jednowierszowych INSERT-ów).
+
+_DOLLAR_TAG = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$")
+_DELIMITER = re.compile(r"DELIMITER[ \t]+(\S+)[ \t]*(?:\r?\n|$)", re.I)
+
+
+def _skip_quoted(sql: str, i: int, quote: str, backslash: bool) -> int:
+    """Zwraca indeks za zamykającym cudzysłowem (podwojony cudzysłów to znak w środku)."""
+    i += 1
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        if backslash and ch == "\\":
+            i += 2
+            continue
+        if ch == quote:
+            if i + 1 < n and sql[i + 1] == quote:
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    return n
+
+
+def _skip_token(sql: str, i: int, dialect: str) -> int | None:
+    """
+    Jeśli na pozycji i zaczyna się literał, identyfikator w cudzysłowie albo komentarz,
+    zwraca indeks za nim. None gdy to zwykły znak.
+    """
+    ch = sql[i]
+    if ch == "'":
+        return _skip_quoted(sql, i, "'", backslash=dialect == "mysql")
+    if ch == '"':
+        return _skip_quoted(sql, i, '"', backslash=dialect == "mysql")
+    if ch == "`" and dialect == "mysql":
+        return _skip_quoted(sql, i, "`", backslash=False)
+    if sql.startswith("--", i) or (ch == "#" and dialect == "mysql"):
+        end = sql.find("\n", i)
+        return len(sql) if end == -1 else end + 1
+    if sql.startswith("/*", i):
+        end = sql.find("*/", i + 2)
+        return len(sql) if end == -1 else end + 2
+    if ch == "$" and dialect == "postgresql":
+        # Ciało funkcji: $$ ... $$ albo $tag$ ... $tag$
+        match = _DOLLAR_TAG.match(sql, i)
+        if match and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+            end = sql.find(match.group(0), match.end())
+            return len(sql) if end == -1 else end + len(match.group(0))
+    return None
+
+
+def split_statements(sql: str, dialect: str) -> list[str]:
+    """
+    Dzieli skrypt na instrukcje po średnikach leżących poza literałami, komentarzami
+    i blokami $$ (postgres). Dla MySQL obsługuje polecenie klienta DELIMITER.
+    """
+    statements = []
+    delimiter = ";"
+    start = 0
+    i = 0
+    n = len(sql)
+    while i < n:
+        if dialect == "mysql" and (i == 0 or sql[i - 1] == "\n"):
+            match = _DELIMITER.match(sql, i)
+            if match:
+                _append(statements, sql[start:i], dialect)
+                delimiter = match.group(1)
+                i = start = match.end()
+                continue
+        end = _skip_token(sql, i, dialect)
+        if end is not None:
+            i = end
+            continue
+        if sql.startswith(delimiter, i):
+            _append(statements, sql[start:i], dialect)
+            i = start = i + len(delimiter)
+            continue
+        i += 1
+    _append(statements, sql[start:], dialect)
+    return statements
+
+
+def top_level_words(sql: str, dialect: str) -> set[str]:
+    """
+    Słowa (małymi literami) leżące poza literałami, komentarzami i nawiasami,
+    np. żeby sprawdzić, czy SELECT ma już własny LIMIT (a nie tylko podzapytanie).
+    """
+    words = set()
+    depth = 0
+    i = 0
+    n = len(sql)
+    while i < n:
+        end = _skip_token(sql, i, dialect)
+        if end is not None:
+            i = end
+            continue
+        ch = sql[i]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch.isalpha() or ch == "_":
+            start = i
+            while i < n and (sql[i].isalnum() or sql[i] in "_$"):
+                i += 1
+            if depth == 0:
+                words.add(sql[start:i].lower())
+            continue
+        i += 1
+    return words
+
+
+def _append(statements: list, statement: str, dialect: str):
+    if not _is_blank(statement, dialect):
+        statements.append(statement.strip())
+
+
+def _is_blank(statement: str, dialect: str) -> bool:
+    """Same białe znaki i komentarze (--, /* */, w MySQL także #) - baza odrzuciłaby to jako puste zapytanie."""
+    i = 0
+    n = len(statement)
+    while i < n:
+        if statement[i].isspace():
+            i += 1
+        elif statement.startswith(("--", "/*"), i) or (statement[i] == "#" and dialect == "mysql"):
+            i = _skip_token(statement, i, dialect)
+        else:
+            return False
+    return True
+
+
+_INSERT_HEAD = re.compile(
+    r"\s*INSERT\s+INTO\s+((?:[\w$.]+|\"[^\"]+\"|`[^`]+`)+)\s*(\([^()]*\))?\s*VALUES\s*",
+    re.I
+)
+
+
+def split_insert(statement: str, dialect: str) -> tuple[str, list[str]] | None:
+    """
+    Rozbiera "INSERT INTO t (kolumny) VALUES (...), (...)" na (nagłówek, lista krotek).
+    None dla wszystkiego innego - także INSERT-ów z ON CONFLICT, RETURNING, SELECT itp.
+    """
+    match = _INSERT_HEAD.match(statement)
+    if not match:
+        return None
+    table, columns = match.group(1), match.group(2) or ""
+    head = f"INSERT INTO {table} {columns}".rstrip() + " VALUES "
+
+    tuples = []
+    i = match.end()
+    n = len(statement)
+    while True:
+        while i < n and statement[i].isspace():
+            i += 1
+        if i >= n or statement[i] != "(":
+            return None
+        depth = 0
+        begin = i
+        while i < n:
+            end = _skip_token(statement, i, dialect)
+            if end is not None:
+                i = end
+                continue
+            if statement[i] == "(":
+                depth += 1
+            elif statement[i] == ")":
+                depth -= 1
+                if depth == 0:
+                    i += 1
+                    break
+            i += 1
+        if depth != 0:
+            return None
+        tuples.append(statement[begin:i])
+        while i < n and statement[i].isspace():
+            i += 1
+        if i >= n:
+            return head, tuples
+        if statement[i] != ",":
+            # Coś po VALUES (ON CONFLICT, RETURNING...) - zostawiamy instrukcję bez zmian
+            return None
+        i += 1
+
+
+def batch_inserts(statements: list[str], dialect: str, batch_rows: int = 1000) -> list[tuple[int, int, str]]:
+    """
+    Skleja kolejne INSERT-y do tej samej tabeli i tych samych kolumn w wielowierszowe INSERT-y
+    po maksymalnie batch_rows krotek. Zwraca (indeks pierwszej instrukcji, ile instrukcji, SQL).
+    """
+    batches = []
+    pending_head = None
+    pending = [] # (indeks instrukcji, krotki)
+
+    def flush():
+        if not pending:
+            return
+        rows = []
+        first = pending[0][0]
+        count = 0
+        for index, tuples in pending:
+            # Instrukcja trafia do tej paczki, w której się zaczyna
+            if rows and len(rows) + len(tuples) > batch_rows:
+                batches.append((first, count, pending_head + ", ".join(rows)))
+                rows, first, count = [], index, 0
+            rows.extend(tuples)
+            count += 1
+        batches.append((first, count, pending_head + ", ".join(rows)))
+        pending.clear()
+
+    for index, statement in enumerate(statements):
+        parsed = split_insert(statement, dialect)
+        if parsed is None:
+            flush()
+            pending_head = None
+            batches.append((index, 1, statement))
+            continue
+        head, tuples = parsed
+        # Dokładne porównanie: "T" i "t" (albo Users i users w MySQL na Linuksie) to różne tabele
+        if head != pending_head:
+            flush()
+            pending_head = head
+        pending.append((index, tuples))
+    flush()
+    return batches
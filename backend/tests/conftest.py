@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Moduły backendu są płaskie (import services, import sql_script) - testy odpalamy z katalogu backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+import pytest
+
+from services import classify_sql
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM orders",
+    "  select id from orders;  ",
+    "WITH t AS (SELECT 1) SELECT * FROM t",
+    "SELECT 'insert into x' AS txt FROM t",
+    "SELECT \"update\" FROM t",
+    "SELECT $$drop table x$$",
+    "SELECT * FROM t -- delete from t",
+    "SELECT * FROM t /* ; drop table t */",
+    "EXPLAIN SELECT * FROM t",
+    "SHOW TABLES",
+])
+def test_read(sql):
+    assert classify_sql(sql) == "read"
+
+
+@pytest.mark.parametrize("sql", [
+    "INSERT INTO t VALUES (1)",
+    "UPDATE t SET a = 1",
+    "DELETE FROM t",
+    "CREATE TABLE t (id int)",
+    "SELECT 1; SELECT 2",
+    "SELECT 1; DROP TABLE t",
+    "WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d",
+    "SELECT * INTO backup FROM t",
+    "SELECT * FROM t FOR UPDATE",
+    "SELECT nextval('seq')",
+    "SELECT pg_terminate_backend(1)",
+    "SELECT pg_cancel_backend(pid) FROM pg_stat_activity",
+    "SELECT pg_advisory_lock(42)",
+    "SELECT set_config('search_path', 'x', false)",
+    "SELECT GET_LOCK('a', 10)",
+    "SELECT SLEEP(5)",
+    "SELECT * FROM dblink('dbname=x', 'delete from t') AS r(a int)",
+    "",
+    "-- tylko komentarz",
+])
+def test_write(sql):
+    assert classify_sql(sql) == "write"
@@ -0,0 +1,57 @@
+import decimal
+import io
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+import encoding
+import export
+
+
+def read_parquet(monkeypatch, columns, batches, types=None):
+    # Dwa wiersze na grupę, żeby każdy test miał kilka grup
+    monkeypatch.setattr(export, "PARQUET_ROW_GROUP", 2)
+    data = b"".join(export.parquet_chunks(columns, iter(batches), types))
+    return pq.read_table(io.BytesIO(data))
+
+
+def test_null_first_group_without_declared_type_becomes_text(monkeypatch):
+    table = read_parquet(monkeypatch, ["id", "note"], [[(1, None), (2, None)], [(3, "a"), (4, 5)]])
+    assert table.schema.field("note").type == pa.string()
+    assert table.column("note").to_pylist() == [None, None, "a", "5"]
+
+
+def test_null_first_group_uses_declared_type(monkeypatch):
+    types = encoding.arrow_types("postgresql", [(23, None, None), (20, None, None)])
+    table = read_parquet(monkeypatch, ["id", "n"], [[(1, None), (2, None)], [(3, 7)]], types)
+    assert table.schema.field("n").type == pa.int64()
+    assert table.column("n").to_pylist() == [None, None, 7]
+
+
+def test_text_fallback_in_first_group_accepts_later_groups(monkeypatch):
+    table = read_parquet(monkeypatch, ["v"], [[(1,), ("x",)], [(2,), (3,)]])
+    assert table.schema.field("v").type == pa.string()
+    assert table.column("v").to_pylist() == ["1", "x", "2", "3"]
+
+
+def test_declared_decimal_keeps_scale_across_groups(monkeypatch):
+    types = encoding.arrow_types("mysql", [(246, 12, 2)])
+    rows = [[(decimal.Decimal("1"),), (decimal.Decimal("2.5"),)], [(decimal.Decimal("1234567.25"),)]]
+    table = read_parquet(monkeypatch, ["amount"], rows, types)
+    assert table.schema.field("amount").type == pa.decimal128(38, 2)
+    assert table.column("amount").to_pylist()[-1] == decimal.Decimal("1234567.25")
+
+
+def test_unconstrained_numeric_and_unknown_types():
+    types = encoding.arrow_types("postgresql", [(1700, None, None), (1007, None, None), (None, None, None)])
+    assert types == [pa.string(), None, None]
+    assert encoding.arrow_types("sqlite", [(None, None, None)]) == [None]
+
+
+def test_empty_result_still_has_declared_schema(monkeypatch):
+    types = encoding.arrow_types("postgresql", [(1082, None, None)])
+    table = read_parquet(monkeypatch, ["day"], [], types)
+    assert table.num_rows == 0
+    assert table.schema.field("day").type == pa.date32()
@@ -0,0 +1,36 @@
+import pytest
+
+from services import _is_single_select, _page_statement
+
+
+@pytest.mark.parametrize("sql", [
+    "WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d",
+    "WITH m AS (DELETE FROM a RETURNING *) INSERT INTO b SELECT * FROM m",
+    "WITH x AS (SELECT id FROM t) UPDATE t SET a = 1 WHERE id IN (SELECT id FROM x)",
+    "WITH x AS (SELECT id FROM t) DELETE FROM t WHERE id IN (SELECT id FROM x)",
+    "SELECT * INTO backup FROM t",
+    "SELECT * FROM t FOR UPDATE",
+    "SELECT pg_terminate_backend(1)",
+    "SELECT 1; SELECT 2",
+    "SHOW TABLES",
+    "INSERT INTO t VALUES (1)",
+])
+@pytest.mark.parametrize("dialect", ["postgresql", "mysql"])
+def test_writes_run_unwrapped(sql, dialect):
+    # Bez podzapytania, bez dopisanego LIMIT i bez kursora po stronie serwera
+    assert _page_statement(sql, dialect) is None
+    assert not _is_single_select(sql)
+
+
+def test_plain_select_is_paged():
+    sql = "WITH x AS (SELECT id FROM t) SELECT * FROM x;"
+    assert _is_single_select(sql)
+    assert _page_statement(sql, "postgresql") == \
+        "SELECT * FROM (WITH x AS (SELECT id FROM t) SELECT * FROM x) AS _page LIMIT :_limit OFFSET :_offset"
+    assert _page_statement(sql, "mysql") == "WITH x AS (SELECT id FROM t) SELECT * FROM x LIMIT :_limit OFFSET :_offset"
+
+
+def test_mysql_keeps_own_limit():
+    assert _page_statement("SELECT * FROM t LIMIT 5", "mysql") is None
+    assert _page_statement("SELECT * FROM a JOIN b ON a.id = b.id", "mysql") == \
+        "SELECT * FROM a JOIN b ON a.id = b.id LIMIT :_limit OFFSET :_offset"
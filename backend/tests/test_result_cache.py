@@ -0,0 +1,61 @@
+import os
+
+from result_cache import ResultCache
+
+ROWS = (["a"], [(i,) for i in range(100)], False)
+
+
+def files(directory) -> list[str]:
+    return os.listdir(directory) if os.path.exists(directory) else []
+
+
+def spilling_cache(tmp_path) -> ResultCache:
+    cache = ResultCache()
+    cache.configure(max_bytes=1024 * 1024, spill_bytes=10, spill_dir=str(tmp_path), max_disk_bytes=1024 * 1024)
+    return cache
+
+
+def test_spilled_result_round_trip(tmp_path):
+    cache = spilling_cache(tmp_path)
+    key = ResultCache.key(1, "SELECT a FROM t", 100, 0)
+    cache.put(key, ROWS, 60)
+    assert cache.get(key) == ROWS
+    assert [name for name in files(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_corrupted_spill_file_is_a_miss(tmp_path):
+    cache = spilling_cache(tmp_path)
+    key = ResultCache.key(1, "SELECT a FROM t", 100, 0)
+    cache.put(key, ROWS, 60)
+    (spilled,) = files(tmp_path)
+    with open(tmp_path / spilled, "wb") as f:
+        f.write(b"\x80\x05 uszkodzony")
+    assert cache.get(key) is None
+    assert cache.stats()["size"] == 0
+    assert files(tmp_path) == []
+
+
+def test_same_key_written_twice_keeps_one_file(tmp_path):
+    cache = spilling_cache(tmp_path)
+    key = ResultCache.key(1, "SELECT a FROM t", 100, 0)
+    cache.put(key, ROWS, 60)
+    cache.put(key, (["a"], [(1,)] * 50, False), 60)
+    assert cache.get(key) == (["a"], [(1,)] * 50, False)
+    assert len(files(tmp_path)) == 1
+
+
+def test_put_after_invalidation_is_skipped(tmp_path):
+    cache = spilling_cache(tmp_path)
+    key = ResultCache.key(1, "SELECT a FROM t", 100, 0)
+    generation = cache.generation(1)
+    cache.invalidate_project(1)
+    cache.put(key, ROWS, 60, generation)
+    assert cache.get(key) is None
+    assert files(tmp_path) == []
+
+
+def test_configure_clears_configured_directory(tmp_path):
+    stale = tmp_path / "1-stary.pkl"
+    stale.write_bytes(b"x")
+    spilling_cache(tmp_path)
+    assert not stale.exists()
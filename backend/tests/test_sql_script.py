@@ -0,0 +1,116 @@
+from sql_script import batch_inserts, split_insert, split_statements, top_level_words
+
+
+def test_split_on_semicolons():
+    assert split_statements("SELECT 1; SELECT 2;\n\n", "postgresql") == ["SELECT 1", "SELECT 2"]
+
+
+def test_split_ignores_semicolons_in_literals_and_comments():
+    sql = "INSERT INTO t VALUES ('a;b', \"c;d\"); -- x; y\nSELECT 1 /* ; */; SELECT 'it''s;'"
+    assert split_statements(sql, "postgresql") == [
+        "INSERT INTO t VALUES ('a;b', \"c;d\")",
+        "-- x; y\nSELECT 1 /* ; */",
+        "SELECT 'it''s;'",
+    ]
+
+
+def test_split_skips_comment_only_statements():
+    assert split_statements("-- tylko komentarz;\n/* i tu */;SELECT 1", "postgresql") == ["SELECT 1"]
+
+
+def test_split_skips_mysql_hash_comment_statements():
+    assert split_statements("SELECT 1;\n# koniec skryptu\n", "mysql") == ["SELECT 1"]
+    assert split_statements("SELECT 1;\n# koniec; naprawdę\n/* i */ -- tyle\n", "mysql") == ["SELECT 1"]
+
+
+def test_split_postgres_dollar_bodies():
+    sql = (
+        "CREATE FUNCTION f() RETURNS int AS $$ BEGIN RETURN 1; END; $$ LANGUAGE plpgsql;\n"
+        "CREATE FUNCTION g() RETURNS int AS $body$ SELECT $$;$$; $body$ LANGUAGE sql;\n"
+        "SELECT f()"
+    )
+    statements = split_statements(sql, "postgresql")
+    assert len(statements) == 3
+    assert statements[0].endswith("LANGUAGE plpgsql")
+    assert statements[1].endswith("LANGUAGE sql")
+
+
+def test_split_dollar_inside_identifier_is_not_a_body():
+    assert split_statements("SELECT a$b$ FROM t; SELECT 2", "postgresql") == ["SELECT a$b$ FROM t", "SELECT 2"]
+
+
+def test_split_mysql_delimiter():
+    sql = (
+        "DELIMITER //\n"
+        "CREATE PROCEDURE p() BEGIN SELECT 1; SELECT 2; END//\n"
+        "DELIMITER ;\n"
+        "CALL p();"
+    )
+    assert split_statements(sql, "mysql") == [
+        "CREATE PROCEDURE p() BEGIN SELECT 1; SELECT 2; END",
+        "CALL p()",
+    ]
+
+
+def test_split_mysql_backslash_escapes_and_hash_comments():
+    sql = "SELECT 'a\\';b'; # komentarz; dalej\nSELECT `x;y` FROM t"
+    assert split_statements(sql, "mysql") == ["SELECT 'a\\';b'", "# komentarz; dalej\nSELECT `x;y` FROM t"]
+
+
+def test_split_insert_values():
+    head, tuples = split_insert("INSERT INTO t (a, b) VALUES (1, 'x, (y)'), (2, f(3))", "postgresql")
+    assert head == "INSERT INTO t (a, b) VALUES "
+    assert tuples == ["(1, 'x, (y)')", "(2, f(3))"]
+
+
+def test_split_insert_rejects_other_forms():
+    assert split_insert("INSERT INTO t VALUES (1) RETURNING id", "postgresql") is None
+    assert split_insert("INSERT INTO t VALUES (1) ON CONFLICT DO NOTHING", "postgresql") is None
+    assert split_insert("INSERT INTO t SELECT * FROM u", "postgresql") is None
+    assert split_insert("UPDATE t SET a = 1", "postgresql") is None
+
+
+def test_batch_inserts_merges_same_table_and_columns():
+    statements = [
+        "INSERT INTO t (a) VALUES (1)",
+        "insert into t (a) values (2), (3)",
+        "INSERT INTO t (b) VALUES (4)",
+        "UPDATE t SET a = 0",
+        "INSERT INTO t (a) VALUES (5)",
+    ]
+    assert batch_inserts(statements, "postgresql") == [
+        (0, 2, "INSERT INTO t (a) VALUES (1), (2), (3)"),
+        (2, 1, "INSERT INTO t (b) VALUES (4)"),
+        (3, 1, "UPDATE t SET a = 0"),
+        (4, 1, "INSERT INTO t (a) VALUES (5)"),
+    ]
+
+
+def test_batch_inserts_does_not_merge_tables_differing_in_case():
+    statements = ['INSERT INTO "T" VALUES (1)', 'INSERT INTO "t" VALUES (2)', "INSERT INTO Users VALUES (3)",
+                  "INSERT INTO users VALUES (4)"]
+    assert [count for _, count, _ in batch_inserts(statements, "postgresql")] == [1, 1, 1, 1]
+    assert [count for _, count, _ in batch_inserts(statements, "mysql")] == [1, 1, 1, 1]
+
+
+def test_batch_inserts_keeps_returning_statements_alone():
+    statements = ["INSERT INTO t VALUES (1)", "INSERT INTO t VALUES (2) RETURNING id", "INSERT INTO t VALUES (3)"]
+    assert batch_inserts(statements, "postgresql") == [
+        (0, 1, "INSERT INTO t VALUES (1)"),
+        (1, 1, "INSERT INTO t VALUES (2) RETURNING id"),
+        (2, 1, "INSERT INTO t VALUES (3)"),
+    ]
+
+
+def test_batch_inserts_respects_batch_rows():
+    statements = [f"INSERT INTO t VALUES ({i})" for i in range(5)]
+    batches = batch_inserts(statements, "postgresql", batch_rows=2)
+    assert [(index, count) for index, count, _ in batches] == [(0, 2), (2, 2), (4, 1)]
+    assert batches[1][2] == "INSERT INTO t VALUES (2), (3)"
+
+
+def test_top_level_words_skip_subqueries_and_literals():
+    words = top_level_words("SELECT 'limit' FROM t WHERE id IN (SELECT id FROM u LIMIT 1) -- limit", "mysql")
+    assert "limit" not in words
+    assert {"select", "from", "where", "in"} <= words
+    assert "limit" in top_level_words("SELECT * FROM t LIMIT 5", "mysql")